@@ -0,0 +1,67 @@
+"""
+Construction shared by the FastAPI applications that the entry-point scripts serve
+"""
+from typing import Any, Awaitable, Callable, Sequence, Type, TypeVar
+
+import msgspec
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+
+T = TypeVar("T")
+
+# Frontend development servers
+FRONTEND_ORIGINS = [
+    "http://localhost:3000",
+    "http://localhost:5173",
+    "http://127.0.0.1:5173",
+]
+
+def make_app(title: str,
+             cors_origins: Sequence[str] = ("*",),
+             response_class: Type[JSONResponse] = JSONResponse,
+             **kwargs: Any) -> FastAPI:
+    """
+    Create a FastAPI application with the project's CORS policy
+    
+    Args:
+        title: Title shown in the API docs
+        cors_origins: Origins allowed to call the API
+        response_class: Default response class for the routes
+        **kwargs: Further FastAPI arguments, such as version
+        
+    Returns:
+        The configured application, ready for routes
+    """
+    app = FastAPI(title=title, default_response_class=response_class, **kwargs)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=list(cors_origins),
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
+
+def msgspec_body(model: Type[T]) -> Callable[[Request], Awaitable[T]]:
+    """
+    FastAPI dependency that decodes the JSON request body into a msgspec Struct,
+    parsing and validating in one pass
+    
+    Args:
+        model: The msgspec.Struct type of the body
+        
+    Returns:
+        The dependency, for use with Depends
+    """
+    decoder = msgspec.json.Decoder(model)
+    
+    async def decode_body(request: Request) -> T:
+        try:
+            return decoder.decode(await request.body())
+        except msgspec.ValidationError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except msgspec.DecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    
+    return decode_body
@@ -8,7 +8,7 @@ import copy
 from app.services.detection_orchestrator import DetectionOrchestrator
 from app.services.file_service import FileService
 from app.utils.db import get_database
-from app.utils.serialization import convert_numpy_types
+from app.utils.serialization import convert_numpy_types_inplace
 
 logger = logging.getLogger(__name__)
 
@@ -394,8 +394,9 @@ async def _store_detection_result(file_id: str, result: Dict[str, Any], user_id:
                 # Remove the original processed document object
                 del result_copy["metadata"]["processing_info"]["processed_document"]
         
-        # Convert NumPy types to Python native types for MongoDB storage
-        result_safe = convert_numpy_types(result_copy)
+        # Convert NumPy types to Python native types for MongoDB storage; the
+        # deep copy is ours, so it is converted in place
+        result_safe = convert_numpy_types_inplace(result_copy)
         
         detection_record = {
             "file_id": file_id,
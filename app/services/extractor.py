@@ -2,6 +2,7 @@
 Document text extraction service with OCR and MRZ parsing capabilities.
 Supports PDF, DOCX, XLSX, and image files.
 """
+import asyncio
 import os
 import logging
 import fitz  # PyMuPDF
@@ -16,12 +17,16 @@ from passporteye.mrz.image import MRZPipeline
 import io
 import re
 import tempfile
+import threading
 import cv2
 from typing import Dict, List, Any, Optional, Tuple, Union
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Serializes PyMuPDF work across the threads extract_text runs on
+_FITZ_LOCK = threading.Lock()
+
 # Supported file types
 SUPPORTED_TYPES = ["pdf", "docx", "xlsx", "jpg", "jpeg", "png", "tiff", "tif", "bmp"]
 
@@ -40,6 +45,8 @@ class MRZDetector:
             'mrvb': re.compile(r'[A-Z0-9<]{36}\n[A-Z0-9<]{36}')
         }
         self.pipeline = MRZPipeline(extra_cmdline_params='--oem 0')
+        # The pipeline keeps per-run state, and extractions may run on several threads
+        self._pipeline_lock = threading.Lock()
 
     def detect_from_text(self, text: str) -> Optional[Dict[str, Any]]:
         """Detect MRZ from text using regex patterns"""
@@ -73,7 +80,8 @@ class MRZDetector:
                 image_bytes = output.getvalue()
             
             # Process with passporteye
-            result = self.pipeline.process(image_bytes=image_bytes)
+            with self._pipeline_lock:
+                result = self.pipeline.process(image_bytes=image_bytes)
             if result and result.valid:
                 return {
                     'mrz_type': result.mrz_type,
@@ -267,66 +275,69 @@ class DocumentExtractor:
         """
         Extract text from PDF files, handling both normal and scanned PDFs
         """
-        results = []
-        try:
-            # Open PDF with PyMuPDF
-            doc = fitz.open(file_path)
+        # PyMuPDF does not support multithreaded use, and extractions run on
+        # worker threads, so only one PDF is read at a time
+        with _FITZ_LOCK:
+            results = []
+            try:
+                # Open PDF with PyMuPDF
+                doc = fitz.open(file_path)
             
-            for page_num, page in enumerate(doc, 1):
-                blocks = []
-                page_info = {"width": page.rect.width, "height": page.rect.height, "rotation": page.rotation}
+                for page_num, page in enumerate(doc, 1):
+                    blocks = []
+                    page_info = {"width": page.rect.width, "height": page.rect.height, "rotation": page.rotation}
                 
-                # Apply rotation correction if needed
-                page = self._handle_rotation(page)
+                    # Apply rotation correction if needed
+                    page = self._handle_rotation(page)
                 
-                # Check if page appears to be scanned
-                is_scanned = self._is_page_scanned(page)
+                    # Check if page appears to be scanned
+                    is_scanned = self._is_page_scanned(page)
                 
-                # Extract text blocks from PDF using PyMuPDF
-                for b in page.get_text("blocks"):
-                    text, bbox = b[4], b[:4]
-                    conf = 1.0  # PyMuPDF doesn't provide confidence
-                    block_type = "text"
+                    # Extract text blocks from PDF using PyMuPDF
+                    for b in page.get_text("blocks"):
+                        text, bbox = b[4], b[:4]
+                        conf = 1.0  # PyMuPDF doesn't provide confidence
+                        block_type = "text"
                     
-                    # Check for MRZ in text
-                    mrz_result = self.mrz_detector.detect_from_text(text)
-                    if mrz_result:
-                        block_type = "mrz"
+                        # Check for MRZ in text
+                        mrz_result = self.mrz_detector.detect_from_text(text)
+                        if mrz_result:
+                            block_type = "mrz"
                         
-                    # Add block to results
-                    blocks.append({
-                        "text": text,
-                        "bbox": self._normalize_bbox(bbox, source='pdf'),
-                        "conf": conf,
-                        "type": block_type,
-                        "metadata": {"mrz_data": mrz_result} if mrz_result else {}
-                    })
+                        # Add block to results
+                        blocks.append({
+                            "text": text,
+                            "bbox": self._normalize_bbox(bbox, source='pdf'),
+                            "conf": conf,
+                            "type": block_type,
+                            "metadata": {"mrz_data": mrz_result} if mrz_result else {}
+                        })
                 
-                # Apply OCR for scanned pages or pages with little text
-                if is_scanned:
-                    # Render page to image
-                    pix = page.get_pixmap(alpha=False)
-                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+                    # Apply OCR for scanned pages or pages with little text
+                    if is_scanned:
+                        # Render page to image
+                        pix = page.get_pixmap(alpha=False)
+                        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
                     
-                    # Apply OCR
-                    ocr_blocks = self._apply_ocr(img)
+                        # Apply OCR
+                        ocr_blocks = self._apply_ocr(img)
                     
-                    # Add OCR blocks to results
-                    blocks.extend(ocr_blocks)
+                        # Add OCR blocks to results
+                        blocks.extend(ocr_blocks)
                 
-                # Add page results
-                results.append({
-                    "page": page_num, 
-                    "text_blocks": blocks,
-                    "page_info": page_info,
-                    "is_scanned": is_scanned
-                })
+                    # Add page results
+                    results.append({
+                        "page": page_num, 
+                        "text_blocks": blocks,
+                        "page_info": page_info,
+                        "is_scanned": is_scanned
+                    })
                 
-        except Exception as e:
-            logger.error(f"PDF processing error: {e}")
-            raise
+            except Exception as e:
+                logger.error(f"PDF processing error: {e}")
+                raise
             
-        return results
+            return results
     
     def _extract_from_docx(self, file_path: str) -> List[Dict[str, Any]]:
         """
@@ -515,19 +526,22 @@ class DocumentExtractor:
         try:
             # Process file based on type
             if file_type == "pdf":
-                return self._extract_from_pdf(file_path)
+                extract = self._extract_from_pdf
                 
             elif file_type == "docx":
-                return self._extract_from_docx(file_path)
+                extract = self._extract_from_docx
                 
             elif file_type == "xlsx":
-                return self._extract_from_xlsx(file_path)
+                extract = self._extract_from_xlsx
                 
             elif file_type in ["jpg", "jpeg", "png", "tiff", "tif", "bmp"]:
-                return self._extract_from_image(file_path)
+                extract = self._extract_from_image
                 
             else:
                 raise ValueError(f"Unsupported file type: {file_type}")
+            
+            # Parsing and OCR block, so they run off the event loop
+            return await asyncio.to_thread(extract, file_path)
                 
         except Exception as e:
             logger.error(f"Text extraction error for {file_path}: {e}")
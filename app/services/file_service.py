@@ -78,12 +78,9 @@ class FileService:
         """Extract text from PDF file"""
         try:
             import PyPDF2
-            text = ""
             with open(file_path, 'rb') as f:
                 pdf_reader = PyPDF2.PdfReader(f)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-            return text
+                return "".join(page.extract_text() + "\n" for page in pdf_reader.pages)
         except ImportError:
             raise Exception("PyPDF2 not installed. Please install with: pip install PyPDF2")
         except Exception as e:
@@ -94,10 +91,7 @@ class FileService:
         try:
             import docx
             doc = docx.Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
+            return "".join(paragraph.text + "\n" for paragraph in doc.paragraphs)
         except ImportError:
             raise Exception("python-docx not installed. Please install with: pip install python-docx")
         except Exception as e:
@@ -5,26 +5,128 @@ Supports multiple output formats including PDF, DOCX, JSON, and API responses.
 
 from typing import Dict, Any, List, Optional, Union, BinaryIO, Tuple
 import os
-import json
 import logging
 import io
 import base64
 from pathlib import Path
 from datetime import datetime
 import asyncio
-import uuid
+import secrets
+import re
+import time
+import zipfile
+from xml.sax.saxutils import escape
 
 # Import document manipulation libraries
 import PyPDF2
-from docx import Document
 import pandas as pd
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 
 from app.schemas.pii_schemas import PIIDetectionResult, RedactionResult, AuditLogEntry
+from app.utils.serialization import dumps_json
 
 logger = logging.getLogger(__name__)
 
+# Minimal WordprocessingML package used by the DOCX formatter
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+_DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '</Types>'
+)
+
+_DOCX_PACKAGE_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+
+_DOCX_DOCUMENT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+_DOCX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    f'<w:styles xmlns:w="{_W_NS}">'
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/>'
+    '<w:basedOn w:val="Normal"/><w:pPr><w:outlineLvl w:val="0"/></w:pPr>'
+    '<w:rPr><w:b/><w:sz w:val="32"/></w:rPr></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Heading2"><w:name w:val="heading 2"/>'
+    '<w:basedOn w:val="Normal"/><w:pPr><w:outlineLvl w:val="1"/></w:pPr>'
+    '<w:rPr><w:b/><w:sz w:val="26"/></w:rPr></w:style>'
+    '<w:style w:type="table" w:styleId="TableGrid"><w:name w:val="Table Grid"/>'
+    '<w:tblPr><w:tblBorders>'
+    '<w:top w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+    '<w:left w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+    '<w:bottom w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+    '<w:right w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+    '<w:insideH w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+    '<w:insideV w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+    '</w:tblBorders></w:tblPr></w:style>'
+    '</w:styles>'
+)
+
+# document.xml is the body paragraphs and the statistics rows joined between
+# these pieces, so no user text is ever searched for placeholders
+_DOCX_DOCUMENT_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    f'<w:document xmlns:w="{_W_NS}"><w:body>'
+)
+
+_DOCX_TABLE_HEAD = (
+    '<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:w="0" w:type="auto"/></w:tblPr>'
+    '<w:tblGrid><w:gridCol w:w="4320"/><w:gridCol w:w="4320"/></w:tblGrid>'
+)
+
+_DOCX_DOCUMENT_TAIL = (
+    '</w:tbl>'
+    '<w:sectPr><w:pgSz w:w="12240" w:h="15840"/>'
+    '<w:pgMar w:top="1440" w:right="1440" w:bottom="1440" w:left="1440" '
+    'w:header="720" w:footer="720" w:gutter="0"/></w:sectPr>'
+    '</w:body></w:document>'
+)
+
+# Characters XML 1.0 does not allow; text extracted from PDFs and OCR often
+# carries form feeds and other control characters
+_XML_INVALID_RE = re.compile('[^\t\n\r\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]')
+
+def _docx_run(text: str) -> str:
+    """Escape text into a single run, turning newlines into line breaks and form feeds into page breaks"""
+    pages = (
+        '</w:t><w:br/><w:t xml:space="preserve">'.join(
+            escape(_XML_INVALID_RE.sub("", line)) for line in page.split("\n")
+        )
+        for page in text.split("\f")
+    )
+    breaks = '</w:t><w:br w:type="page"/><w:t xml:space="preserve">'.join(pages)
+    return f'<w:r><w:t xml:space="preserve">{breaks}</w:t></w:r>'
+
+def _docx_paragraph(text: str, style: Optional[str] = None) -> str:
+    """Render a paragraph element, optionally with a paragraph style"""
+    props = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f"<w:p>{props}{_docx_run(text)}</w:p>"
+
+def _docx_table_row(*cells: str) -> str:
+    """Render a table row with one plain paragraph per cell"""
+    return "<w:tr>" + "".join(f"<w:tc><w:p>{_docx_run(cell)}</w:p></w:tc>" for cell in cells) + "</w:tr>"
+
 class OutputFormatter:
     """
     Service for formatting and saving redacted content in various formats
@@ -33,6 +135,17 @@ class OutputFormatter:
     def __init__(self, output_dir: str = "redacted_outputs"):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        
+        # Format handlers keyed by normalized format name. Every entry takes
+        # (redaction_result, redacted_text, detection_entities, output_path, metadata)
+        self._dispatch = {
+            "pdf": lambda result, text, entities, path, meta: self._create_pdf_output(text, entities, path, meta),
+            "docx": lambda result, text, entities, path, meta: self._create_docx_output(text, entities, path, meta),
+            "json": lambda result, text, entities, path, meta: self._create_json_output(result, path, meta),
+            "csv": lambda result, text, entities, path, meta: self._create_csv_output(result, path, meta),
+            "text": lambda result, text, entities, path, meta: self._create_text_output(text, path, meta),
+            "api_response": lambda result, text, entities, path, meta: self._create_api_response(result, meta),
+        }
     
     async def format_output(self, 
                            redaction_result: Union[RedactionResult, Dict[str, Any]],
@@ -51,40 +164,27 @@ class OutputFormatter:
         Returns:
             Dictionary with output information and paths
         """
-        if isinstance(redaction_result, dict):
-            redacted_text = redaction_result.get("redacted_text", "")
-            detection_entities = redaction_result.get("detected_entities", [])
-        else:
-            redacted_text = redaction_result.redacted_text
-            detection_entities = redaction_result.detected_entities
+        redaction_result = self._normalize(redaction_result)
+        redacted_text = redaction_result.get("redacted_text", "")
+        detection_entities = redaction_result.get("detected_entities", [])
             
         metadata = metadata or {}
         
         # Generate a filename if not provided
         if not output_path:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"redacted_{timestamp}_{uuid.uuid4().hex[:8]}.{format_type}"
+            filename = f"redacted_{time.time_ns()}_{secrets.token_hex(4)}.{format_type}"
             output_path = str(self.output_dir / filename)
         
         try:
             # Process based on format type
-            if format_type.lower() == "pdf":
-                result = await self._create_pdf_output(redacted_text, detection_entities, output_path, metadata)
-            elif format_type.lower() == "docx":
-                result = await self._create_docx_output(redacted_text, detection_entities, output_path, metadata)
-            elif format_type.lower() == "json":
-                result = await self._create_json_output(redaction_result, output_path, metadata)
-            elif format_type.lower() == "csv":
-                result = await self._create_csv_output(redaction_result, output_path, metadata)
-            elif format_type.lower() == "text":
-                result = await self._create_text_output(redacted_text, output_path, metadata)
-            elif format_type.lower() == "api_response":
-                result = await self._create_api_response(redaction_result, metadata)
-            else:
+            handler = self._dispatch.get(format_type.lower())
+            if handler is None:
                 return {
                     "success": False,
                     "error": f"Unsupported format type: {format_type}"
                 }
+            
+            result = await handler(redaction_result, redacted_text, detection_entities, output_path, metadata)
                 
             # Create audit log entry
             audit_entry = self._create_audit_log(redaction_result, format_type, output_path, metadata)
@@ -99,6 +199,49 @@ class OutputFormatter:
                 "error": str(e)
             }
     
+    async def format_outputs(self,
+                            redaction_result: Union[RedactionResult, Dict[str, Any]],
+                            format_types: List[str],
+                            metadata: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """
+        Format redacted content into several formats concurrently
+        
+        Args:
+            redaction_result: Redaction result object or dictionary
+            format_types: Output formats to produce (see format_output)
+            metadata: Additional metadata to include in every output
+            
+        Returns:
+            List of output information dictionaries, in the order of format_types
+        """
+        # Convert once so every formatter shares the same entity dictionaries
+        normalized = self._normalize(redaction_result)
+        return await asyncio.gather(*(
+            self.format_output(normalized, format_type, metadata=metadata)
+            for format_type in format_types
+        ))
+    
+    def _normalize(self, redaction_result: Union[RedactionResult, Dict[str, Any]]) -> Dict[str, Any]:
+        """Convert a redaction result into the dictionary form shared by all formatters"""
+        if isinstance(redaction_result, dict):
+            return redaction_result
+        
+        # Only the fields the formatters emit; the original text is never carried along
+        return {
+            "redacted_text": redaction_result.redacted_text,
+            "redaction_count": redaction_result.redaction_count,
+            "detected_entities": [
+                entity.dict() if hasattr(entity, "dict") else dict(entity)
+                for entity in redaction_result.detected_entities
+            ],
+            "processing_time": redaction_result.processing_time
+        }
+    
+    async def _write_bytes(self, output_path: str, data: bytes) -> int:
+        """Write serialized output to disk without blocking the event loop"""
+        await asyncio.to_thread(Path(output_path).write_bytes, data)
+        return len(data)
+    
     async def _create_pdf_output(self, 
                                 redacted_text: str, 
                                 detection_entities: List[Any],
@@ -112,68 +255,15 @@ class OutputFormatter:
                 # Modify existing PDF
                 return await self._redact_existing_pdf(original_pdf_path, redacted_text, detection_entities, output_path)
             else:
-                # Create new PDF from scratch
-                buffer = io.BytesIO()
-                c = canvas.Canvas(buffer, pagesize=letter)
-                width, height = letter
-                
-                # Add header with metadata
-                c.setFont("Helvetica-Bold", 14)
-                c.drawString(72, height - 72, "Redacted Document")
-                
-                c.setFont("Helvetica", 10)
-                c.drawString(72, height - 90, f"Processed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                
-                if metadata.get("document_id"):
-                    c.drawString(72, height - 108, f"Document ID: {metadata['document_id']}")
-                
-                # Add the redacted text
-                c.setFont("Helvetica", 10)
-                text_obj = c.beginText(72, height - 144)
-                
-                # Simple word wrapping
-                words = redacted_text.split()
-                line = ""
-                for word in words:
-                    if len(line + " " + word) * 6 < width - 144:  # Approximate width
-                        line = line + " " + word if line else word
-                    else:
-                        text_obj.textLine(line)
-                        line = word
-                
-                if line:
-                    text_obj.textLine(line)
-                
-                c.drawText(text_obj)
-                
-                # Add footer with redaction statistics
-                c.setFont("Helvetica-Oblique", 9)
-                
-                # Count entities by type
-                type_counts = {}
-                for entity in detection_entities:
-                    entity_type = entity.pii_type if hasattr(entity, "pii_type") else entity.get("pii_type", "unknown")
-                    type_counts[entity_type] = type_counts.get(entity_type, 0) + 1
-                
-                footer_text = "Redaction summary: "
-                for entity_type, count in type_counts.items():
-                    footer_text += f"{entity_type}={count}, "
-                
-                footer_text = footer_text.rstrip(", ")
-                c.drawString(72, 36, footer_text)
-                
-                # Finalize PDF
-                c.save()
-                
-                # Save the PDF to file
-                with open(output_path, "wb") as f:
-                    f.write(buffer.getvalue())
+                # Create new PDF from scratch; rendering is CPU-bound so run it off the loop
+                data = await asyncio.to_thread(self._render_pdf, redacted_text, detection_entities, metadata)
+                size_bytes = await self._write_bytes(output_path, data)
                 
                 return {
                     "success": True,
                     "format": "pdf",
                     "output_path": output_path,
-                    "size_bytes": os.path.getsize(output_path)
+                    "size_bytes": size_bytes
                 }
         
         except Exception as e:
@@ -184,6 +274,62 @@ class OutputFormatter:
                 "error": str(e)
             }
     
+    def _render_pdf(self,
+                    redacted_text: str,
+                    detection_entities: List[Any],
+                    metadata: Dict[str, Any]) -> bytes:
+        """Render a new PDF with redacted content and return its bytes"""
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer, pagesize=letter)
+        width, height = letter
+        
+        # Add header with metadata
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(72, height - 72, "Redacted Document")
+        
+        c.setFont("Helvetica", 10)
+        c.drawString(72, height - 90, f"Processed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        
+        if metadata.get("document_id"):
+            c.drawString(72, height - 108, f"Document ID: {metadata['document_id']}")
+        
+        # Add the redacted text
+        c.setFont("Helvetica", 10)
+        text_obj = c.beginText(72, height - 144)
+        
+        # Simple word wrapping
+        words = redacted_text.split()
+        line = ""
+        for word in words:
+            if len(line + " " + word) * 6 < width - 144:  # Approximate width
+                line = line + " " + word if line else word
+            else:
+                text_obj.textLine(line)
+                line = word
+        
+        if line:
+            text_obj.textLine(line)
+        
+        c.drawText(text_obj)
+        
+        # Add footer with redaction statistics
+        c.setFont("Helvetica-Oblique", 9)
+        
+        # Count entities by type
+        type_counts = {}
+        for entity in detection_entities:
+            entity_type = entity.pii_type if hasattr(entity, "pii_type") else entity.get("pii_type", "unknown")
+            type_counts[entity_type] = type_counts.get(entity_type, 0) + 1
+        
+        footer_text = "Redaction summary: " + ", ".join(
+            f"{entity_type}={count}" for entity_type, count in type_counts.items()
+        )
+        c.drawString(72, 36, footer_text)
+        
+        # Finalize PDF
+        c.save()
+        return buffer.getvalue()
+    
     async def _redact_existing_pdf(self, 
                                   original_pdf: str,
                                   redacted_text: str, 
@@ -193,49 +339,14 @@ class OutputFormatter:
         # Note: Full PDF redaction with proper visual overlay requires more sophisticated libraries
         # This is a simplified version that creates a new PDF with the redacted text
         try:
-            buffer = io.BytesIO()
-            c = canvas.Canvas(buffer, pagesize=letter)
-            width, height = letter
-            
-            # Add header
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(72, height - 72, "Redacted Document (Original PDF)")
-            
-            c.setFont("Helvetica", 10)
-            c.drawString(72, height - 90, f"Processed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            c.drawString(72, height - 108, f"Original PDF: {os.path.basename(original_pdf)}")
-            
-            # Add the redacted text
-            c.setFont("Helvetica", 10)
-            text_obj = c.beginText(72, height - 144)
-            
-            # Simple word wrapping
-            words = redacted_text.split()
-            line = ""
-            for word in words:
-                if len(line + " " + word) * 6 < width - 144:  # Approximate width
-                    line = line + " " + word if line else word
-                else:
-                    text_obj.textLine(line)
-                    line = word
-            
-            if line:
-                text_obj.textLine(line)
-            
-            c.drawText(text_obj)
-            
-            # Finalize PDF
-            c.save()
-            
-            # Save the PDF to file
-            with open(output_path, "wb") as f:
-                f.write(buffer.getvalue())
+            data = await asyncio.to_thread(self._render_existing_pdf, original_pdf, redacted_text)
+            size_bytes = await self._write_bytes(output_path, data)
             
             return {
                 "success": True,
                 "format": "pdf",
                 "output_path": output_path,
-                "size_bytes": os.path.getsize(output_path),
+                "size_bytes": size_bytes,
                 "note": "Simple text replacement. For full PDF redaction with visual overlay, advanced PDF libraries are required."
             }
             
@@ -247,6 +358,43 @@ class OutputFormatter:
                 "error": str(e)
             }
     
+    def _render_existing_pdf(self, original_pdf: str, redacted_text: str) -> bytes:
+        """Render the replacement PDF for an existing PDF and return its bytes"""
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer, pagesize=letter)
+        width, height = letter
+        
+        # Add header
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(72, height - 72, "Redacted Document (Original PDF)")
+        
+        c.setFont("Helvetica", 10)
+        c.drawString(72, height - 90, f"Processed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        c.drawString(72, height - 108, f"Original PDF: {os.path.basename(original_pdf)}")
+        
+        # Add the redacted text
+        c.setFont("Helvetica", 10)
+        text_obj = c.beginText(72, height - 144)
+        
+        # Simple word wrapping
+        words = redacted_text.split()
+        line = ""
+        for word in words:
+            if len(line + " " + word) * 6 < width - 144:  # Approximate width
+                line = line + " " + word if line else word
+            else:
+                text_obj.textLine(line)
+                line = word
+        
+        if line:
+            text_obj.textLine(line)
+        
+        c.drawText(text_obj)
+        
+        # Finalize PDF
+        c.save()
+        return buffer.getvalue()
+    
     async def _create_docx_output(self, 
                                  redacted_text: str, 
                                  detection_entities: List[Any],
@@ -254,54 +402,14 @@ class OutputFormatter:
                                  metadata: Dict[str, Any]) -> Dict[str, Any]:
         """Create a DOCX file with redacted content"""
         try:
-            doc = Document()
-            
-            # Add title
-            doc.add_heading("Redacted Document", level=1)
-            
-            # Add metadata
-            doc.add_paragraph(f"Processed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            
-            if metadata.get("document_id"):
-                doc.add_paragraph(f"Document ID: {metadata['document_id']}")
-            
-            # Add horizontal rule
-            doc.add_paragraph("_" * 50)
-            
-            # Add redacted content
-            doc.add_paragraph(redacted_text)
-            
-            # Add redaction statistics
-            doc.add_heading("Redaction Statistics", level=2)
-            
-            # Count entities by type
-            type_counts = {}
-            for entity in detection_entities:
-                entity_type = entity.pii_type if hasattr(entity, "pii_type") else entity.get("pii_type", "unknown")
-                type_counts[entity_type] = type_counts.get(entity_type, 0) + 1
-            
-            table = doc.add_table(rows=1, cols=2)
-            table.style = 'Table Grid'
-            
-            # Add header row
-            header_cells = table.rows[0].cells
-            header_cells[0].text = "PII Type"
-            header_cells[1].text = "Count"
-            
-            # Add data rows
-            for entity_type, count in type_counts.items():
-                row_cells = table.add_row().cells
-                row_cells[0].text = str(entity_type)
-                row_cells[1].text = str(count)
-            
-            # Save the document
-            doc.save(output_path)
+            data = await asyncio.to_thread(self._render_docx, redacted_text, detection_entities, metadata)
+            size_bytes = await self._write_bytes(output_path, data)
             
             return {
                 "success": True,
                 "format": "docx",
                 "output_path": output_path,
-                "size_bytes": os.path.getsize(output_path)
+                "size_bytes": size_bytes
             }
             
         except Exception as e:
@@ -312,6 +420,47 @@ class OutputFormatter:
                 "error": str(e)
             }
     
+    def _render_docx(self,
+                     redacted_text: str,
+                     detection_entities: List[Any],
+                     metadata: Dict[str, Any]) -> bytes:
+        """Build a DOCX document with redacted content and return its bytes"""
+        # Count entities by type
+        type_counts = {}
+        for entity in detection_entities:
+            entity_type = entity.pii_type if hasattr(entity, "pii_type") else entity.get("pii_type", "unknown")
+            type_counts[entity_type] = type_counts.get(entity_type, 0) + 1
+        
+        paragraphs = [
+            _docx_paragraph("Redacted Document", style="Heading1"),
+            _docx_paragraph(f"Processed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        ]
+        
+        if metadata.get("document_id"):
+            paragraphs.append(_docx_paragraph(f"Document ID: {metadata['document_id']}"))
+        
+        # Add horizontal rule, redacted content and the statistics heading
+        paragraphs.append(_docx_paragraph("_" * 50))
+        paragraphs.append(_docx_paragraph(redacted_text))
+        paragraphs.append(_docx_paragraph("Redaction Statistics", style="Heading2"))
+        
+        rows = [_docx_table_row("PII Type", "Count")]
+        rows.extend(_docx_table_row(str(entity_type), str(count)) for entity_type, count in type_counts.items())
+        
+        document_xml = "".join((
+            _DOCX_DOCUMENT_HEAD, *paragraphs, _DOCX_TABLE_HEAD, *rows, _DOCX_DOCUMENT_TAIL
+        ))
+        
+        # Write the package parts directly instead of building a python-docx object tree
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as package:
+            package.writestr("[Content_Types].xml", _DOCX_CONTENT_TYPES)
+            package.writestr("_rels/.rels", _DOCX_PACKAGE_RELS)
+            package.writestr("word/_rels/document.xml.rels", _DOCX_DOCUMENT_RELS)
+            package.writestr("word/styles.xml", _DOCX_STYLES)
+            package.writestr("word/document.xml", document_xml)
+        return buffer.getvalue()
+    
     async def _create_json_output(self, 
                                  redaction_result: Union[RedactionResult, Dict[str, Any]],
                                  output_path: str, 
@@ -344,14 +493,14 @@ class OutputFormatter:
                 }
             
             # Write to JSON file
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(result_dict, f, indent=2, ensure_ascii=False)
+            data = dumps_json(result_dict, indent=True)
+            size_bytes = await self._write_bytes(output_path, data)
             
             return {
                 "success": True,
                 "format": "json",
                 "output_path": output_path,
-                "size_bytes": os.path.getsize(output_path)
+                "size_bytes": size_bytes
             }
             
         except Exception as e:
@@ -404,13 +553,14 @@ class OutputFormatter:
             
             # Create DataFrame and save to CSV
             df = pd.DataFrame(rows)
-            df.to_csv(output_path, index=False)
+            data = df.to_csv(index=False).encode("utf-8")
+            size_bytes = await self._write_bytes(output_path, data)
             
             return {
                 "success": True,
                 "format": "csv",
                 "output_path": output_path,
-                "size_bytes": os.path.getsize(output_path),
+                "size_bytes": size_bytes,
                 "row_count": len(rows)
             }
             
@@ -429,26 +579,29 @@ class OutputFormatter:
         """Create a plain text file with redacted content"""
         try:
             # Add a simple header
-            header = "===== REDACTED DOCUMENT =====\n"
-            header += f"Processed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+            parts = [
+                "===== REDACTED DOCUMENT =====\n",
+                f"Processed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+            ]
             
             if metadata.get("document_id"):
-                header += f"Document ID: {metadata['document_id']}\n"
+                parts.append(f"Document ID: {metadata['document_id']}\n")
                 
-            header += "=" * 30 + "\n\n"
+            parts.append("=" * 30 + "\n\n")
             
             # Combine header and content
-            content = header + redacted_text
+            parts.append(redacted_text)
+            content = "".join(parts)
             
             # Write to file
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(content)
+            data = content.encode("utf-8")
+            size_bytes = await self._write_bytes(output_path, data)
             
             return {
                 "success": True,
                 "format": "text",
                 "output_path": output_path,
-                "size_bytes": os.path.getsize(output_path)
+                "size_bytes": size_bytes
             }
             
         except Exception as e:
@@ -464,42 +617,32 @@ class OutputFormatter:
                                  metadata: Dict[str, Any]) -> Dict[str, Any]:
         """Format redaction result for API response"""
         try:
-            # Extract necessary data
             if isinstance(redaction_result, dict):
-                redacted_text = redaction_result.get("redacted_text", "")
-                
-                # Make a copy to avoid modifying the original
-                response = {
-                    "success": True,
-                    "redacted_text": redacted_text,
-                    "metadata": metadata,
-                    "timestamp": datetime.now().isoformat()
-                }
-                
-                # Include redaction counts if available
-                if "redaction_count" in redaction_result:
-                    response["redaction_statistics"] = {
-                        "total_redactions": sum(redaction_result["redaction_count"].values()),
-                        "by_type": redaction_result["redaction_count"]
-                    }
-                    
-                # Include processing time if available
-                if "processing_time" in redaction_result:
-                    response["processing_time"] = redaction_result["processing_time"]
+                get = redaction_result.get
             else:
                 # It's a RedactionResult object
-                response = {
-                    "success": True,
-                    "redacted_text": redaction_result.redacted_text,
-                    "metadata": metadata,
-                    "timestamp": datetime.now().isoformat(),
-                    "redaction_statistics": {
-                        "total_redactions": sum(redaction_result.redaction_count.values()),
-                        "by_type": redaction_result.redaction_count
-                    },
-                    "processing_time": redaction_result.processing_time
+                get = lambda key, default=None: getattr(redaction_result, key, default)
+            
+            response = {
+                "success": True,
+                "redacted_text": get("redacted_text", ""),
+                "metadata": metadata,
+                "timestamp": datetime.now().isoformat()
+            }
+            
+            # Include redaction counts if available
+            redaction_count = get("redaction_count")
+            if redaction_count is not None:
+                response["redaction_statistics"] = {
+                    "total_redactions": sum(redaction_count.values()),
+                    "by_type": redaction_count
                 }
             
+            # Include processing time if available
+            processing_time = get("processing_time")
+            if processing_time is not None:
+                response["processing_time"] = processing_time
+            
             return response
             
         except Exception as e:
@@ -1,27 +1,302 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Set, Tuple
+from collections import defaultdict
+from dataclasses import dataclass, field
+import asyncio
 import logging
-from datetime import datetime
+import string
+import sys
+import threading
+from bisect import bisect_left
+from datetime import datetime, timezone
+from pymongo.errors import BulkWriteError
 from app.utils.db import get_database
 from app.services.detection_pipeline import BaseDetector, DetectionCandidate, EntityType
 import re
 
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse, sre_constants
+
 logger = logging.getLogger(__name__)
 
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
+
+# Knowledge-base entity type strings to pipeline entity types
+_TYPE_MAP = {sys.intern(key): value for key, value in {
+    "person": EntityType.PERSON,
+    "email": EntityType.EMAIL,
+    "phone": EntityType.PHONE,
+    "ssn": EntityType.SSN,
+    "credit_card": EntityType.CREDIT_CARD,
+    "organization": EntityType.ORGANIZATION,
+    "address": EntityType.ADDRESS,
+    "date": EntityType.DATE,
+    "ip_address": EntityType.IP_ADDRESS,
+    "url": EntityType.URL,
+    "pan": EntityType.PAN,
+    "iban": EntityType.IBAN
+}.items()}
+
+# Heuristic patterns used to find entities near context keywords
+_PERSON_RE = re.compile(r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b')
+_ORG_RE = re.compile(r'\b[A-Z][a-zA-Z\s&,.-]+\b')
+_LOC_RE = re.compile(r'\b[A-Z][a-zA-Z\s,-]+\b')
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+def _lower_preserving_offsets(text: str) -> str:
+    """Lowercase text without changing its length, so offsets stay valid"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # A few characters (e.g. U+0130) expand when lowercased; leave those as-is
+    return "".join(char if len(char.lower()) != 1 else char.lower() for char in text)
+
+class KeywordIndex:
+    """Finds every whole-word occurrence of a set of keywords in one pass over the text"""
+    
+    def __init__(self, keywords: Iterable[Tuple[str, str]]):
+        # keyword (lowercased) -> tags (entity types) that use it
+        self.tags: Dict[str, Set[str]] = {}
+        for keyword, tag in keywords:
+            if keyword:
+                self.tags.setdefault(keyword.lower(), set()).add(tag)
+        
+        self._automaton = None
+        self._regex = None
+        self._prefixes: Dict[str, List[str]] = {}
+        if not self.tags:
+            return
+        
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self.tags:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+        else:
+            # Zero-width lookahead so matches starting at every position are reported.
+            # The word boundaries sit inside it, so when the longest keyword at a
+            # position ends mid-word the alternation falls back to a shorter one
+            keywords = sorted(self.tags, key=len, reverse=True)
+            alternation = "|".join(re.escape(k) for k in keywords)
+            self._regex = re.compile(f"(?<!\\w)(?=({alternation})(?!\\w))")
+            # The regex reports one keyword per position; shorter keywords that are
+            # prefixes of it may also end on a word boundary there, as Aho-Corasick reports
+            self._prefixes = {
+                keyword: [k for k in keywords if len(k) < len(keyword) and keyword.startswith(k)]
+                for keyword in keywords
+            }
+    
+    def iter_matches(self, lowered_text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield (start, end, keyword) for whole-word keyword hits in already-lowercased text"""
+        if self._automaton is not None:
+            hits = (
+                (end + 1 - len(keyword), end + 1, keyword)
+                for end, keyword in self._automaton.iter(lowered_text)
+            )
+        elif self._regex is not None:
+            hits = (
+                (m.start(1), m.start(1) + len(keyword), keyword)
+                for m in self._regex.finditer(lowered_text)
+                for keyword in (m.group(1), *self._prefixes[m.group(1)])
+            )
+        else:
+            return
+        
+        text_length = len(lowered_text)
+        for start, end, keyword in hits:
+            if start > 0 and _is_word_char(lowered_text[start - 1]):
+                continue
+            if end < text_length and _is_word_char(lowered_text[end]):
+                continue
+            yield start, end, keyword
+    
+    def match_tags(self, lowered_text: str) -> Set[str]:
+        """Return the tags of every keyword present in already-lowercased text"""
+        found = set()
+        for _, _, keyword in self.iter_matches(lowered_text):
+            found |= self.tags[keyword]
+        return found
+
+class PatternPrefilter:
+    """Single-pass Hyperscan scan reporting which tags have a pattern that may match"""
+    
+    _FLAGS = 0
+    if HYPERSCAN_AVAILABLE:
+        _FLAGS = (hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH |
+                  hyperscan.HS_FLAG_PREFILTER | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP)
+    
+    def __init__(self, patterns: Iterable[Tuple[str, str]]):
+        # Tags with a pattern Hyperscan cannot compile must always be checked with re
+        self.unfiltered_tags: Set[str] = set()
+        self._tags: List[str] = []
+        self._db = None
+        self._local = threading.local()
+        if not HYPERSCAN_AVAILABLE:
+            return
+        
+        expressions = []
+        for pattern, tag in patterns:
+            expression = pattern.encode("utf-8")
+            try:
+                hyperscan.Database().compile(expressions=[expression], flags=[self._FLAGS])
+            except Exception:
+                self.unfiltered_tags.add(tag)
+                continue
+            expressions.append(expression)
+            self._tags.append(tag)
+        
+        if not expressions:
+            return
+        
+        try:
+            self._db = hyperscan.Database()
+            self._db.compile(
+                expressions=expressions,
+                ids=list(range(len(expressions))),
+                elements=len(expressions),
+                flags=[self._FLAGS] * len(expressions)
+            )
+        except Exception as e:
+            logger.warning(f"Hyperscan prefilter disabled: {e}")
+            self._db = None
+    
+    @property
+    def available(self) -> bool:
+        return self._db is not None
+    
+    def _scratch(self):
+        # Scratch space is not thread-safe, so each worker thread gets its own
+        scratch = getattr(self._local, "scratch", None)
+        if scratch is None:
+            scratch = self._local.scratch = hyperscan.Scratch(self._db)
+        return scratch
+    
+    def match_tags(self, text: str) -> Set[str]:
+        """Return the tags whose patterns may match text (a superset of the re matches)"""
+        found = set()
+        
+        def on_match(pattern_id, start, end, flags, context):
+            found.add(self._tags[pattern_id])
+        
+        self._db.scan(text.encode("utf-8"), match_event_handler=on_match, scratch=self._scratch())
+        return found
+
+def _required_items(items) -> Iterator[Tuple[int, str]]:
+    """Yield (rank, char class) for elements every match of a parsed sequence must contain"""
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            char = chr(av)
+            if char == "@":
+                yield 0, "@"
+            elif not char.isalnum() and not char.isspace():
+                yield 1, re.escape(char)
+            elif char.isalnum():
+                yield 3, re.escape(char)
+        elif op is sre_constants.IN:
+            # \d and ranges inside 0-9; a text without any digit cannot match either
+            if av == [(sre_constants.CATEGORY, sre_constants.CATEGORY_DIGIT)] or (
+                    av and all(kind is sre_constants.RANGE and 48 <= value[0] <= value[1] <= 57
+                               for kind, value in av)):
+                yield 2, r"\d"
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            min_repeat, _, sub = av
+            if min_repeat >= 1:
+                yield from _required_items(sub)
+        elif op is sre_constants.SUBPATTERN:
+            yield from _required_items(av[-1])
+
+def _required_class(pattern: str) -> Optional[str]:
+    """Most selective character class that must occur in any match of pattern, if one is known"""
+    try:
+        required = list(_required_items(sre_parse.parse(pattern)))
+    except Exception:
+        return None
+    return min(required)[1] if required else None
+
+_STRIP_PUNCT = str.maketrans({char: " " for char in string.punctuation})
+
+def _words(text: str) -> List[str]:
+    """Lowercased words of text, split on whitespace and punctuation in one pass"""
+    return text.lower().translate(_STRIP_PUNCT).split()
+
+def _phrase_ngrams(text: str, max_n: int = 3) -> Set[str]:
+    """Lowercased 1..max_n word n-grams of text"""
+    words = _words(text)
+    return {" ".join(words[i:i + n]) for n in range(1, max_n + 1) for i in range(len(words) - n + 1)}
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+@dataclass(slots=True, eq=False)
 class EntityDefinition:
     """Represents an entity definition in the knowledge base"""
     
-    def __init__(self, entity_type: str, name: str, description: str, 
-                 patterns: List[str] = None, context_keywords: List[str] = None,
-                 sensitivity_level: str = "medium", examples: List[str] = None):
-        self.entity_type = entity_type
-        self.name = name
-        self.description = description
-        self.patterns = patterns or []
-        self.context_keywords = context_keywords or []
-        self.sensitivity_level = sensitivity_level  # low, medium, high, critical
-        self.examples = examples or []
-        self.created_at = datetime.utcnow()
-        self.updated_at = datetime.utcnow()
+    entity_type: str
+    name: str
+    description: str
+    patterns: List[str] = field(default_factory=list)
+    context_keywords: List[str] = field(default_factory=list)
+    sensitivity_level: str = "medium"  # low, medium, high, critical
+    examples: List[str] = field(default_factory=list)
+    created_at: datetime = field(default_factory=_utcnow)
+    updated_at: datetime = field(default_factory=_utcnow)
+    
+    # Matching state derived from the fields above by _compile()
+    _compiled_patterns: List[Tuple[str, "re.Pattern"]] = field(init=False, repr=False, default=None)
+    _union_sources: Dict[str, str] = field(init=False, repr=False, default=None)
+    _union_re: Optional["re.Pattern"] = field(init=False, repr=False, default=None)
+    _required_classes: Optional[frozenset] = field(init=False, repr=False, default=None)
+    _examples_lower: frozenset = field(init=False, repr=False, default=None)
+    _context_keywords_lower: frozenset = field(init=False, repr=False, default=None)
+    
+    def __post_init__(self):
+        self.entity_type = sys.intern(self.entity_type)
+        self.patterns = self.patterns or []
+        self.context_keywords = self.context_keywords or []
+        self.examples = self.examples or []
+        self._compile()
+    
+    def _compile(self):
+        """Compile patterns and keyword lookups once so detection reuses them"""
+        self._compiled_patterns = []
+        for pattern in self.patterns:
+            try:
+                self._compiled_patterns.append((pattern, re.compile(pattern, re.IGNORECASE)))
+            except re.error as e:
+                logger.warning(f"Invalid pattern in definition {self.name}: {e}")
+        
+        # Single alternation over all valid patterns so a definition scans the text once;
+        # the named group that matched identifies the source pattern
+        self._union_sources = {f"p{i}": pattern for i, (pattern, _) in enumerate(self._compiled_patterns)}
+        try:
+            self._union_re = re.compile(
+                "|".join(f"(?P<{group}>{pattern})" for group, pattern in self._union_sources.items()),
+                re.IGNORECASE
+            ) if self._union_sources else None
+        except re.error:
+            # Patterns with their own numbered backreferences or group names cannot be combined
+            self._union_re = None
+        
+        # Cheap presence checks: a pattern can only match text containing its required class.
+        # None when any pattern has no known requirement, so the definition is never skipped
+        required = [_required_class(pattern) for pattern, _ in self._compiled_patterns]
+        self._required_classes = frozenset(required) if required and None not in required else None
+        
+        self._examples_lower = frozenset(example.lower() for example in self.examples)
+        self._context_keywords_lower = frozenset(keyword.lower() for keyword in self.context_keywords)
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -32,24 +307,32 @@ class EntityDefinition:
             "context_keywords": self.context_keywords,
             "sensitivity_level": self.sensitivity_level,
             "examples": self.examples,
+            "phraselist": self.phraselist(),
             "created_at": self.created_at,
             "updated_at": self.updated_at
         }
     
+    def phraselist(self) -> List[str]:
+        """Searchable n-grams of the name, description and context keywords"""
+        phrases = _phrase_ngrams(self.name) | _phrase_ngrams(self.description)
+        for keyword in self.context_keywords:
+            phrases |= _phrase_ngrams(keyword)
+        return sorted(phrases)
+    
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'EntityDefinition':
-        obj = cls(
+        now = _utcnow()
+        return cls(
             entity_type=data["entity_type"],
             name=data["name"],
             description=data["description"],
             patterns=data.get("patterns", []),
             context_keywords=data.get("context_keywords", []),
             sensitivity_level=data.get("sensitivity_level", "medium"),
-            examples=data.get("examples", [])
+            examples=data.get("examples", []),
+            created_at=data.get("created_at") or now,
+            updated_at=data.get("updated_at") or now
         )
-        obj.created_at = data.get("created_at", datetime.utcnow())
-        obj.updated_at = data.get("updated_at", datetime.utcnow())
-        return obj
 
 class KnowledgeBase:
     """MongoDB-based knowledge base for entity definitions"""
@@ -57,6 +340,14 @@ class KnowledgeBase:
     def __init__(self):
         self.collection_name = "entity_definitions"
         self._initialized = False
+        self._keyword_index: Optional[KeywordIndex] = None
+        self._pattern_prefilter: Optional[PatternPrefilter] = None
+        
+        # In-process copy of the definitions collection, loaded by initialize()
+        self._all_definitions: Optional[List[EntityDefinition]] = None
+        self._by_type: Dict[str, List[EntityDefinition]] = defaultdict(list)
+        self._search_words: Dict[EntityDefinition, Set[str]] = {}
+        self.version = 0  # Bumped on every cache change
     
     async def initialize(self):
         """Initialize knowledge base with default entity definitions"""
@@ -73,27 +364,38 @@ class KnowledgeBase:
         # Check if already initialized
         count = await collection.count_documents({})
         if count > 0:
+            # Backfill search phrases for definitions stored before the phraselist index existed
+            async for doc in collection.find({"phraselist": {"$exists": False}}):
+                phraselist = EntityDefinition.from_dict(doc).phraselist()
+                await collection.update_one({"_id": doc["_id"]}, {"$set": {"phraselist": phraselist}})
+            await collection.create_index([("phraselist", 1)])
+            
+            await self._load_definitions(collection)
             self._initialized = True
             return
         
         # Insert default entity definitions
         default_definitions = self._get_default_definitions()
         
-        for definition in default_definitions:
-            await collection.insert_one(definition.to_dict())
+        docs = [definition.to_dict() for definition in default_definitions]
+        if docs:
+            try:
+                await collection.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                # A concurrent or retried initialization already inserted some of them
+                logger.warning(f"Some default entity definitions were not inserted: {e.details.get('writeErrors', [])[:1]}")
         
-        # Create text index for semantic search
-        await collection.create_index([
-            ("name", "text"),
-            ("description", "text"),
-            ("context_keywords", "text")
-        ])
+        # Index the pre-tokenized search phrases for equality lookups
+        await collection.create_index([("phraselist", 1)])
         
+        await self._load_definitions(collection)
         self._initialized = True
         logger.info(f"Initialized knowledge base with {len(default_definitions)} entity definitions")
     
     def _get_default_definitions(self) -> List[EntityDefinition]:
         """Get default entity definitions"""
+        # Free-text runs are length-bounded (and digit runs atomic) so a long line that
+        # never reaches the suffix costs linear, not quadratic, backtracking
         return [
             EntityDefinition(
                 entity_type="person",
@@ -108,7 +410,7 @@ class KnowledgeBase:
                 entity_type="email",
                 name="Email Address",
                 description="Electronic mail addresses including personal and business emails",
-                patterns=[r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b"],
+                patterns=[r"\b[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9.-]{1,253}\.[A-Z|a-z]{2,}\b"],
                 context_keywords=["email", "e-mail", "contact", "address"],
                 sensitivity_level="high",
                 examples=["john@example.com", "sarah.johnson@company.org"]
@@ -152,7 +454,7 @@ class KnowledgeBase:
                 entity_type="organization",
                 name="Organization Name",
                 description="Names of companies, institutions, and other organizations",
-                patterns=[r"\b[A-Z][a-zA-Z\s&,.-]+(?:Inc|LLC|Corp|Company|Ltd|University|College)\b"],
+                patterns=[r"\b[A-Z][a-zA-Z\s&,.-]{0,80}(?:Inc|LLC|Corp|Company|Ltd|University|College)\b"],
                 context_keywords=["company", "organization", "corporation", "institute", "university"],
                 sensitivity_level="low",
                 examples=["Acme Corporation", "State University", "ABC Company Inc."]
@@ -161,7 +463,7 @@ class KnowledgeBase:
                 entity_type="address",
                 name="Physical Address",
                 description="Street addresses, postal addresses, and location information",
-                patterns=[r"\b\d+\s+[A-Za-z\s]+(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd)\b"],
+                patterns=[r"\b(?>\d+)\s+[A-Za-z\s]{1,60}(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd)\b"],
                 context_keywords=["address", "street", "avenue", "road", "location"],
                 sensitivity_level="medium",
                 examples=["123 Main Street", "456 Oak Avenue"]
@@ -192,15 +494,56 @@ class KnowledgeBase:
                 entity_type="url",
                 name="URL/Website",
                 description="Website URLs and links that may contain sensitive information",
-                patterns=[r"https?://(?:[-\w.])+(?:[:\d]+)?(?:/(?:[\w/_.])*)?"],
+                patterns=[r"https?://(?>[-\w.]{1,253})(?::\d{1,5})?(?:/[\w/.]{0,2048})?"],
                 context_keywords=["url", "website", "link", "http", "https"],
                 sensitivity_level="low",
                 examples=["https://example.com", "http://internal.company.com"]
             )
         ]
     
+    async def _load_definitions(self, collection):
+        """Load every definition into the in-process cache"""
+        self._all_definitions = [EntityDefinition.from_dict(doc) async for doc in collection.find({})]
+        self._reindex()
+    
+    def _reindex(self):
+        """Rebuild per-type lookups after the cached definitions change"""
+        self._by_type = defaultdict(list)
+        self._search_words = {}
+        for definition in self._all_definitions:
+            self._by_type[definition.entity_type].append(definition)
+            self._search_words[definition] = set(_words(
+                " ".join([definition.name, definition.description, *definition.context_keywords])
+            ))
+        self._keyword_index = None
+        self._pattern_prefilter = None
+        self.version += 1
+    
+    def _search_cached(self, query: str, entity_types: List[str] = None) -> List[EntityDefinition]:
+        """Search the cached definitions, ranking by keyword overlap with the query"""
+        if entity_types:
+            definitions = [d for t in entity_types for d in self._by_type.get(t, [])]
+        else:
+            definitions = list(self._all_definitions)
+        
+        query_words = set(_words(query))
+        if not query_words:
+            return definitions
+        
+        scored = []
+        for definition in definitions:
+            score = len(query_words & self._search_words[definition])
+            if score:
+                scored.append((score, definition))
+        
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [definition for _, definition in scored]
+    
     async def search_definitions(self, query: str, entity_types: List[str] = None) -> List[EntityDefinition]:
         """Search entity definitions using text search"""
+        if self._all_definitions is not None:
+            return self._search_cached(query, entity_types)
+        
         db = get_database()
         if db is None:
             return []
@@ -213,23 +556,50 @@ class KnowledgeBase:
         if entity_types:
             search_filter["entity_type"] = {"$in": entity_types}
         
-        # Add text search
-        if query.strip():
-            search_filter["$text"] = {"$search": query}
-        
-        # Execute search
-        cursor = collection.find(search_filter)
-        if query.strip():
-            cursor = cursor.sort([("score", {"$meta": "textScore"})])
+        # Match query n-grams against the indexed phraselist
+        query_phrases = _phrase_ngrams(query)
+        if query_phrases:
+            search_filter["phraselist"] = {"$in": list(query_phrases)}
         
         results = []
-        async for doc in cursor:
-            results.append(EntityDefinition.from_dict(doc))
+        async for doc in collection.find(search_filter):
+            # Rank by the number of shared phrases, as the text score used to
+            score = len(query_phrases.intersection(doc.get("phraselist", [])))
+            results.append((score, EntityDefinition.from_dict(doc)))
         
-        return results
+        results.sort(key=lambda item: item[0], reverse=True)
+        return [definition for _, definition in results]
+    
+    async def get_keyword_index(self) -> KeywordIndex:
+        """Get the context-keyword index over all definitions, building it if needed"""
+        if self._keyword_index is None:
+            definitions = await self.search_definitions("")
+            self._keyword_index = KeywordIndex(
+                (keyword, definition.entity_type)
+                for definition in definitions
+                for keyword in definition.context_keywords
+            )
+        return self._keyword_index
+    
+    async def get_pattern_prefilter(self) -> PatternPrefilter:
+        """Get the multi-pattern prefilter over all definitions, building it if needed"""
+        if self._pattern_prefilter is None:
+            definitions = await self.search_definitions("")
+            self._pattern_prefilter = PatternPrefilter(
+                (pattern, definition.entity_type)
+                for definition in definitions
+                for pattern, _ in definition._compiled_patterns
+            )
+        return self._pattern_prefilter
     
     async def get_definition(self, entity_type: str, name: str = None) -> Optional[EntityDefinition]:
         """Get specific entity definition"""
+        if self._all_definitions is not None:
+            for definition in self._by_type.get(entity_type, []):
+                if not name or definition.name == name:
+                    return definition
+            return None
+        
         db = get_database()
         if db is None:
             return None
@@ -253,6 +623,9 @@ class KnowledgeBase:
         
         try:
             await collection.insert_one(definition.to_dict())
+            if self._all_definitions is not None:
+                self._all_definitions.append(definition)
+                self._reindex()
             return True
         except Exception as e:
             logger.error(f"Error adding entity definition: {e}")
@@ -267,12 +640,31 @@ class KnowledgeBase:
         collection = db[self.collection_name]
         
         try:
-            updates["updated_at"] = datetime.utcnow()
+            updates["updated_at"] = _utcnow()
+            
+            # Keep the search phrases in step with the fields they are built from
+            if {"name", "description", "context_keywords"} & updates.keys():
+                doc = await collection.find_one({"entity_type": entity_type, "name": name})
+                if doc:
+                    updates["phraselist"] = EntityDefinition.from_dict({**doc, **updates}).phraselist()
+            
             result = await collection.update_one(
                 {"entity_type": entity_type, "name": name},
                 {"$set": updates}
             )
-            return result.modified_count > 0
+            if result.modified_count == 0:
+                return False
+            
+            if self._all_definitions is not None:
+                doc = await collection.find_one({"entity_type": entity_type, "name": name})
+                self._all_definitions = [
+                    d for d in self._all_definitions
+                    if not (d.entity_type == entity_type and d.name == name)
+                ]
+                if doc:
+                    self._all_definitions.append(EntityDefinition.from_dict(doc))
+                self._reindex()
+            return True
         except Exception as e:
             logger.error(f"Error updating entity definition: {e}")
             return False
@@ -291,105 +683,167 @@ class RAGDetector(BaseDetector):
     
     async def detect(self, text: str, **kwargs) -> List[DetectionCandidate]:
         """Detect entities using RAG-enhanced approach"""
-        candidates = []
+        definitions = await self.knowledge_base.search_definitions("")
+        keyword_index = await self.knowledge_base.get_keyword_index()
+        prefilter = await self.knowledge_base.get_pattern_prefilter()
+        return self._detect_sync(text, definitions, keyword_index, prefilter)
+    
+    async def detect_batch(self, texts: List[str], **kwargs) -> List[List[DetectionCandidate]]:
+        """Detect entities in many texts, sharing definition lookup across the batch"""
+        definitions = await self.knowledge_base.search_definitions("")
+        keyword_index = await self.knowledge_base.get_keyword_index()
+        prefilter = await self.knowledge_base.get_pattern_prefilter()
+        
+        # Scanning is CPU-bound, so each text runs in a worker thread off the event loop
+        return await asyncio.gather(*(
+            asyncio.to_thread(self._detect_sync, text, definitions, keyword_index, prefilter)
+            for text in texts
+        ))
+    
+    def _detect_sync(self, text: str, definitions: List[EntityDefinition],
+                     keyword_index: KeywordIndex,
+                     prefilter: Optional[PatternPrefilter] = None) -> List[DetectionCandidate]:
+        """Run detection for one text against already-loaded definitions"""
+        # Keep only the most confident candidate per (span, type)
+        best: Dict[Tuple[int, int, EntityType], DetectionCandidate] = {}
+        
+        # Find every context keyword in the document once and share the hits
+        keyword_hits = list(keyword_index.iter_matches(_lower_preserving_offsets(text)))
         
         # Get relevant entity definitions based on text content
-        relevant_definitions = await self._get_relevant_definitions(text)
+        relevant_definitions = self._get_relevant_definitions(text, definitions, keyword_index, keyword_hits, prefilter)
         
         for definition in relevant_definitions:
+            hits = self._precompute_keyword_hits(keyword_hits, definition)
+            
             # Apply patterns from knowledge base
-            pattern_candidates = await self._apply_definition_patterns(text, definition)
-            candidates.extend(pattern_candidates)
+            self._offer(best, self._apply_definition_patterns(text, definition, hits))
             
             # Apply context-based detection
-            context_candidates = await self._apply_context_detection(text, definition)
-            candidates.extend(context_candidates)
+            self._offer(best, self._apply_context_detection(text, definition, hits))
         
-        return candidates
+        return list(best.values())
+    
+    def _offer(self, best: Dict[Tuple[int, int, EntityType], DetectionCandidate],
+               candidates: List[DetectionCandidate]):
+        """Merge candidates into best, keeping the highest confidence per (span, type)"""
+        for candidate in candidates:
+            key = (candidate.start_char, candidate.end_char, candidate.type)
+            existing = best.get(key)
+            if existing is None or candidate.confidence > existing.confidence:
+                best[key] = candidate
     
-    async def _get_relevant_definitions(self, text: str) -> List[EntityDefinition]:
+    def _get_relevant_definitions(self, text: str, definitions: List[EntityDefinition],
+                                  keyword_index: KeywordIndex,
+                                  keyword_hits: List[Tuple[int, int, str]],
+                                  prefilter: Optional[PatternPrefilter] = None) -> List[EntityDefinition]:
         """Get entity definitions relevant to the text"""
-        # Extract keywords from text for search
-        words = re.findall(r'\b\w+\b', text.lower())
-        query_keywords = [word for word in words if len(word) > 3][:10]  # Top 10 keywords
-        
-        query = " ".join(query_keywords)
-        
-        # Search knowledge base
-        relevant_definitions = await self.knowledge_base.search_definitions(query)
-        
-        # Also get definitions based on detected patterns
-        for definition in await self.knowledge_base.search_definitions(""):
-            for pattern in definition.patterns:
-                try:
-                    if re.search(pattern, text, re.IGNORECASE):
-                        if definition not in relevant_definitions:
-                            relevant_definitions.append(definition)
-                except re.error:
+        # One keyword pass decides relevance for every definition with context keywords
+        keyword_types = set()
+        for _, _, keyword in keyword_hits:
+            keyword_types |= keyword_index.tags.get(keyword, set())
+        
+        # One Hyperscan pass over every pattern, when available
+        pattern_types = prefilter.match_tags(text) if prefilter is not None and prefilter.available else None
+        
+        # Presence of each required character class, computed at most once per text
+        class_present: Dict[str, bool] = {}
+        
+        relevant_definitions = []
+        for definition in definitions:
+            if not definition.context_keywords or definition.entity_type in keyword_types:
+                relevant_definitions.append(definition)
+                continue
+            
+            if definition._required_classes is not None:
+                for char_class in definition._required_classes:
+                    if char_class not in class_present:
+                        class_present[char_class] = re.search(char_class, text, re.IGNORECASE) is not None
+                if not any(class_present[c] for c in definition._required_classes):
                     continue
+            
+            # Also get definitions based on detected patterns
+            if pattern_types is not None and definition.entity_type not in prefilter.unfiltered_tags:
+                matched = definition.entity_type in pattern_types
+            elif definition._union_re is not None:
+                matched = definition._union_re.search(text) is not None
+            else:
+                matched = any(compiled.search(text) for _, compiled in definition._compiled_patterns)
+            
+            if matched:
+                relevant_definitions.append(definition)
         
         return relevant_definitions
     
-    async def _apply_definition_patterns(self, text: str, definition: EntityDefinition) -> List[DetectionCandidate]:
+    def _precompute_keyword_hits(self, keyword_hits: List[Tuple[int, int, str]],
+                                 definition: EntityDefinition) -> List[Tuple[int, int]]:
+        """Select the document's keyword hits that belong to a definition, sorted by start"""
+        keywords = definition._context_keywords_lower
+        return sorted((start, end) for start, end, keyword in keyword_hits if keyword in keywords)
+    
+    def _apply_definition_patterns(self, text: str, definition: EntityDefinition,
+                                   hits: List[Tuple[int, int]]) -> List[DetectionCandidate]:
         """Apply patterns from entity definition"""
         candidates = []
         
-        for pattern in definition.patterns:
-            try:
-                matches = re.finditer(pattern, text, re.IGNORECASE)
-                
-                for match in matches:
-                    # Calculate confidence based on pattern quality and context
-                    confidence = self._calculate_rag_confidence(match, text, definition)
-                    
-                    candidate = DetectionCandidate(
-                        id=None,
-                        type=self._map_entity_type(definition.entity_type),
-                        text=match.group(),
-                        bbox=None,
-                        confidence=confidence,
-                        start_char=match.start(),
-                        end_char=match.end(),
-                        source=self.name,
-                        metadata={
-                            "rag_definition": definition.name,
-                            "pattern_used": pattern,
-                            "sensitivity_level": definition.sensitivity_level,
-                            "context_match": self._check_context_match(match, text, definition)
-                        }
-                    )
-                    candidates.append(candidate)
-                    
-            except re.error as e:
-                logger.warning(f"Invalid pattern in definition {definition.name}: {e}")
+        for pattern, match in self._iter_definition_matches(text, definition):
+            context_match = self._check_context_match(match, hits)
+            
+            # Calculate confidence based on pattern quality and context
+            confidence = self._calculate_rag_confidence(match, definition, context_match)
+            
+            candidate = DetectionCandidate(
+                id=None,
+                type=self._map_entity_type(definition.entity_type),
+                text=match.group(),
+                bbox=None,
+                confidence=confidence,
+                start_char=match.start(),
+                end_char=match.end(),
+                source=self.name,
+                metadata={
+                    "rag_definition": definition.name,
+                    "pattern_used": pattern,
+                    "sensitivity_level": definition.sensitivity_level,
+                    "context_match": context_match
+                }
+            )
+            candidates.append(candidate)
         
         return candidates
     
-    async def _apply_context_detection(self, text: str, definition: EntityDefinition) -> List[DetectionCandidate]:
+    def _iter_definition_matches(self, text: str, definition: EntityDefinition):
+        """Yield (pattern, match) pairs for every pattern of a definition"""
+        if definition._union_re is not None:
+            for match in definition._union_re.finditer(text):
+                yield definition._union_sources[match.lastgroup], match
+        else:
+            for pattern, compiled in definition._compiled_patterns:
+                for match in compiled.finditer(text):
+                    yield pattern, match
+    
+    def _apply_context_detection(self, text: str, definition: EntityDefinition,
+                                 hits: List[Tuple[int, int]]) -> List[DetectionCandidate]:
         """Apply context-based detection using keywords"""
         candidates = []
         
-        for keyword in definition.context_keywords:
-            # Find keyword occurrences
-            keyword_pattern = rf'\b{re.escape(keyword)}\b'
-            keyword_matches = list(re.finditer(keyword_pattern, text, re.IGNORECASE))
+        # Keyword occurrences come from the single document-wide keyword sweep
+        for keyword_start, keyword_end in hits:
+            # Look for potential entities near the keyword
+            context_start = max(0, keyword_start - self.context_window)
+            context_end = min(len(text), keyword_end + self.context_window)
+            context_text = text[context_start:context_end]
+            
+            # Apply simple heuristics to find potential entities
+            potential_entities = self._find_potential_entities_in_context(
+                context_text, definition, context_start
+            )
             
-            for keyword_match in keyword_matches:
-                # Look for potential entities near the keyword
-                context_start = max(0, keyword_match.start() - self.context_window)
-                context_end = min(len(text), keyword_match.end() + self.context_window)
-                context_text = text[context_start:context_end]
-                
-                # Apply simple heuristics to find potential entities
-                potential_entities = self._find_potential_entities_in_context(
-                    context_text, definition, context_start
-                )
-                
-                candidates.extend(potential_entities)
+            candidates.extend(potential_entities)
         
         return candidates
     
-    def _calculate_rag_confidence(self, match, text: str, definition: EntityDefinition) -> float:
+    def _calculate_rag_confidence(self, match, definition: EntityDefinition, context_match: bool) -> float:
         """Calculate confidence score using RAG information"""
         base_confidence = 0.7
         
@@ -403,22 +857,27 @@ class RAGDetector(BaseDetector):
         base_confidence += sensitivity_boost.get(definition.sensitivity_level, 0.0)
         
         # Boost for context keyword matches
-        if self._check_context_match(match, text, definition):
+        if context_match:
             base_confidence += 0.15
         
         # Boost for exact example matches
-        if match.group().lower() in [ex.lower() for ex in definition.examples]:
+        if match.group().lower() in definition._examples_lower:
             base_confidence += 0.1
         
         return min(base_confidence, 1.0)
     
-    def _check_context_match(self, match, text: str, definition: EntityDefinition) -> bool:
+    def _check_context_match(self, match, hits: List[Tuple[int, int]]) -> bool:
         """Check if context keywords are present near the match"""
-        context_start = max(0, match.start() - self.context_window)
-        context_end = min(len(text), match.end() + self.context_window)
-        context = text[context_start:context_end].lower()
-        
-        return any(keyword.lower() in context for keyword in definition.context_keywords)
+        window_start = match.start() - self.context_window
+        window_end = match.end() + self.context_window
+        
+        # hits are sorted by start; only those starting inside the window can fit in it
+        for start, end in hits[bisect_left(hits, (window_start, -1)):]:
+            if start >= window_end:
+                break
+            if end <= window_end:
+                return True
+        return False
     
     def _find_potential_entities_in_context(self, context: str, definition: EntityDefinition, offset: int) -> List[DetectionCandidate]:
         """Find potential entities in context using heuristics"""
@@ -427,21 +886,21 @@ class RAGDetector(BaseDetector):
         # Simple heuristics based on entity type
         if definition.entity_type == "person":
             # Look for capitalized words
-            name_pattern = r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b'
+            name_re = _PERSON_RE
         elif definition.entity_type == "organization":
             # Look for title case phrases
-            name_pattern = r'\b[A-Z][a-zA-Z\s&,.-]+\b'
+            name_re = _ORG_RE
         elif definition.entity_type == "location":
             # Look for capitalized location words
-            name_pattern = r'\b[A-Z][a-zA-Z\s,-]+\b'
+            name_re = _LOC_RE
         else:
             return candidates
         
-        matches = re.finditer(name_pattern, context)
+        matches = name_re.finditer(context)
         
         for match in matches:
             # Skip if it's just the context keyword
-            if match.group().lower() in [kw.lower() for kw in definition.context_keywords]:
+            if match.group().lower() in definition._context_keywords_lower:
                 continue
             
             candidate = DetectionCandidate(
@@ -465,21 +924,11 @@ class RAGDetector(BaseDetector):
     
     def _map_entity_type(self, entity_type_str: str) -> EntityType:
         """Map string entity type to EntityType enum"""
-        type_mapping = {
-            "person": EntityType.PERSON,
-            "email": EntityType.EMAIL,
-            "phone": EntityType.PHONE,
-            "ssn": EntityType.SSN,
-            "credit_card": EntityType.CREDIT_CARD,
-            "organization": EntityType.ORGANIZATION,
-            "address": EntityType.ADDRESS,
-            "date": EntityType.DATE,
-            "ip_address": EntityType.IP_ADDRESS,
-            "url": EntityType.URL,
-            "pan": EntityType.PAN,
-            "iban": EntityType.IBAN
-        }
-        return type_mapping.get(entity_type_str.lower(), EntityType.CUSTOM)
+        # Stored types are already lowercase, so the lower() fallback is rarely taken
+        mapped = _TYPE_MAP.get(entity_type_str)
+        if mapped is None:
+            mapped = _TYPE_MAP.get(entity_type_str.lower(), EntityType.CUSTOM)
+        return mapped
     
     def get_supported_types(self) -> List[EntityType]:
         """Return all possible entity types"""
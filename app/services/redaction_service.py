@@ -10,8 +10,12 @@ import hashlib
 import base64
 import json
 import secrets
+import random
+from collections import Counter
+from functools import lru_cache
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import os
 
@@ -22,33 +26,141 @@ from app.schemas.pii_schemas import (
 
 logger = logging.getLogger(__name__)
 
+_KDF_SALT = b'pii_redaction_salt'  # Salt should be stored securely in production
+_KDF_ITERATIONS = 100000
+
+# Pseudonyms are display-only fake data, so they come from a userspace PRNG;
+# keys and tokens still use secrets/os.urandom
+_rng = random.Random(os.urandom(16))
+
+_FAKE_FIRST_NAMES = ("John", "Jane", "Alex", "Sam", "Taylor", "Morgan", "Jordan", "Casey")
+_FAKE_LAST_NAMES = ("Smith", "Johnson", "Williams", "Brown", "Jones", "Miller", "Davis")
+
+@lru_cache(maxsize=32)
+def _derive_fernet_key(secret: str, salt: bytes, iterations: int) -> bytes:
+    """Derive a Fernet key from a secret; PBKDF2 is deterministic so results are reused"""
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=iterations
+    )
+    return base64.urlsafe_b64encode(kdf.derive(secret.encode()))
+
+def _mask_leading_digits(text: str, mask_length: int, mask_char: str) -> str:
+    """Mask the first mask_length digits of text, keeping every other character in place"""
+    chars = list(text)
+    for i, char in enumerate(chars):
+        if not mask_length:
+            break
+        if char.isdigit():
+            chars[i] = mask_char
+            mask_length -= 1
+    return ''.join(chars)
+
+def _mask_credit_card(text: str, mask_char: str, preserve_format: bool) -> Optional[str]:
+    """Mask all but last 4 digits (e.g., XXXX-XXXX-XXXX-1234)"""
+    digits = ''.join(filter(str.isdigit, text))
+    if len(digits) < 4:
+        return None
+    mask_length = len(digits) - 4
+    if preserve_format and ('-' in text or ' ' in text):
+        # Try to preserve format (e.g., XXXX-XXXX-XXXX-1234)
+        return _mask_leading_digits(text, mask_length, mask_char)
+    return mask_char * mask_length + digits[-4:]
+
+def _mask_ssn(text: str, mask_char: str, preserve_format: bool) -> Optional[str]:
+    """Mask SSN as XXX-XX-1234"""
+    digits = ''.join(filter(str.isdigit, text))
+    if len(digits) != 9:
+        return None
+    if preserve_format and '-' in text:
+        return f"{mask_char * 3}-{mask_char * 2}-{digits[-4:]}"
+    return f"{mask_char * 5}{digits[-4:]}"
+
+def _mask_phone(text: str, mask_char: str, preserve_format: bool) -> Optional[str]:
+    """Mask phone as (XXX) XXX-1234 or similar"""
+    digits = ''.join(filter(str.isdigit, text))
+    if len(digits) < 4:
+        return None
+    mask_length = len(digits) - 4
+    if preserve_format:
+        return _mask_leading_digits(text, mask_length, mask_char)
+    return f"{mask_char * mask_length}{digits[-4:]}"
+
+def _mask_email(text: str, mask_char: str, preserve_format: bool) -> Optional[str]:
+    """Mask as x***@domain.com"""
+    username, at, domain = text.partition('@')
+    if not at or len(username) <= 1:
+        return None
+    return f"{username[0]}{mask_char * (len(username) - 1)}@{domain}"
+
+def _mask_person_name(text: str, mask_char: str, preserve_format: bool) -> Optional[str]:
+    """Mask as J*** D**"""
+    name_parts = text.split()
+    if len(name_parts) < 2:
+        return None
+    # Each part keeps its first letter, so single-letter initials are unchanged
+    return " ".join(part[0] + mask_char * (len(part) - 1) for part in name_parts)
+
+# PII types with a dedicated partial mask; a masker returns None to fall back to the default
+_PARTIAL_MASKERS = {
+    PIIType.CREDIT_CARD: _mask_credit_card,
+    PIIType.SSN: _mask_ssn,
+    PIIType.PHONE: _mask_phone,
+    PIIType.EMAIL: _mask_email,
+    PIIType.PERSON_NAME: _mask_person_name,
+}
+
+# Category labels used by generalization; other types use their upper-cased value
+_GENERALIZED_LABELS = {
+    PIIType.PERSON_NAME: "[PERSON]",
+    PIIType.EMAIL: "[EMAIL]",
+    PIIType.PHONE: "[PHONE NUMBER]",
+    PIIType.ADDRESS: "[ADDRESS]",
+    PIIType.CREDIT_CARD: "[PAYMENT CARD]",
+    PIIType.SSN: "[SSN]",
+    PIIType.PASSPORT: "[PASSPORT]",
+    PIIType.DRIVERS_LICENSE: "[DRIVER'S LICENSE]",
+    PIIType.DATE_OF_BIRTH: "[DOB]",
+    PIIType.BANK_ACCOUNT: "[BANK ACCOUNT]",
+}
+
 class RedactionService:
     """Service for redacting PII using various strategies"""
     
-    def __init__(self, encryption_key: str = None):
+    def __init__(self, encryption_key: str = None, pbkdf2_iterations: int = _KDF_ITERATIONS):
         """
         Initialize the redaction service
         
         Args:
             encryption_key: Optional key for reversible redaction
                 If not provided, a random key will be generated
+            pbkdf2_iterations: PBKDF2 cost for a provided key. Higher values slow
+                down guessing a weak key but add to construction time
         """
+        # A generated key has 256 bits of entropy and needs no stretching
+        self._key_generated = not encryption_key
         self.encryption_key = encryption_key or secrets.token_urlsafe(32)
+        self.pbkdf2_iterations = pbkdf2_iterations
         self._setup_encryption()
         self.default_options = RedactionOptions()
     
     def _setup_encryption(self):
         """Set up encryption for tokenization"""
         # Generate a key from the encryption key
-        salt = b'pii_redaction_salt'  # Salt should be stored securely in production
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(self.encryption_key.encode()))
+        if self._key_generated:
+            digest = hashlib.blake2b(self.encryption_key.encode(), key=_KDF_SALT, digest_size=32).digest()
+            key = base64.urlsafe_b64encode(digest)
+        else:
+            key = _derive_fernet_key(self.encryption_key, _KDF_SALT, self.pbkdf2_iterations)
         self.cipher = Fernet(key)
+        # Tokens are keyed with their own subkey so the Fernet key is never reused for them
+        self._token_key = HKDF(
+            algorithm=hashes.SHA256(), length=32, salt=_KDF_SALT, info=b'pii_redaction_token'
+        ).derive(base64.urlsafe_b64decode(key))
+        # Keys the one-way token hash so short values cannot be looked up in a precomputed table
+        self._hash_key = hashlib.sha256(self.encryption_key.encode()).digest()
     
     async def redact_text(self, 
                          text: str, 
@@ -80,36 +192,66 @@ class RedactionService:
         # Sort entities by position (end to start to avoid offset issues)
         sorted_entities = sorted(detected_pii, key=lambda x: x.start_position, reverse=True)
         
-        # Make a copy of the original text
-        redacted_text = text
+        # Determine the redaction strategy and any custom replacement once per PII type
+        strategy_table = {}
+        for entity in sorted_entities:
+            if entity.pii_type not in strategy_table:
+                strategy_table[entity.pii_type] = (
+                    self._get_redaction_strategy(entity, options),
+                    options.custom_replacements.get(entity.pii_type)
+                )
+        plans = [strategy_table[entity.pii_type] for entity in sorted_entities]
         
-        # Track redaction counts by type
-        redaction_count = {}
+        # Replacements already computed in this document, so repeated mentions of
+        # a value are redacted once and consistently
+        replacements = {}
         
         # Process each entity
-        for entity in sorted_entities:
-            # Determine redaction strategy for this entity
-            strategy = self._get_redaction_strategy(entity, options)
-            
+        for entity, (strategy, custom) in zip(sorted_entities, plans):
             # Apply redaction
-            redacted_value, redaction_info = await self._apply_redaction_strategy(
-                text=entity.text, 
-                strategy=strategy,
-                pii_type=entity.pii_type, 
-                options=options
-            )
-            
-            # Replace in the text
-            start = entity.start_position
-            end = entity.end_position
-            redacted_text = redacted_text[:start] + redacted_value + redacted_text[end:]
+            if custom is not None:
+                redacted_value, redaction_info = custom, {
+                    "strategy": strategy,
+                    "method": "custom_replacement"
+                }
+            else:
+                # A full mask depends only on the value's length, so equal-length values share it
+                value_key = len(entity.text) if strategy == RedactionStrategy.FULL_MASK else entity.text
+                key = (value_key, strategy, entity.pii_type)
+                replacement = replacements.get(key)
+                if replacement is None:
+                    replacement = replacements[key] = self._apply_redaction_strategy(
+                        text=entity.text, 
+                        strategy=strategy,
+                        pii_type=entity.pii_type, 
+                        options=options
+                    )
+                redacted_value, redaction_info = replacement
             
             # Update entity with redaction info
             entity.redacted_text = redacted_value
             entity.metadata.update(redaction_info)
-            
-            # Track counts
-            redaction_count[entity.pii_type] = redaction_count.get(entity.pii_type, 0) + 1
+        
+        # Build the redacted text front to back and join it once. An entity that
+        # overlaps earlier ones replaces only the part they leave: a length-preserving
+        # mask is cut to that part, any other replacement is inserted whole after
+        # theirs. One inside them adds nothing, so no clear text is left between them
+        parts = []
+        cursor = 0
+        for entity in sorted(sorted_entities, key=lambda x: (x.start_position, -x.end_position)):
+            if entity.end_position <= cursor:
+                continue
+            redacted_value = entity.redacted_text
+            if entity.start_position < cursor and entity.metadata.get("method") == "full_mask":
+                redacted_value = entity.metadata["mask_char"] * (entity.end_position - cursor)
+            parts.append(text[cursor:entity.start_position])
+            parts.append(redacted_value)
+            cursor = entity.end_position
+        parts.append(text[cursor:])
+        redacted_text = ''.join(parts)
+        
+        # Track redaction counts by type
+        redaction_count = dict(Counter(entity.pii_type for entity in sorted_entities))
         
         return RedactionResult(
             original_text=text,
@@ -128,13 +270,13 @@ class RedactionService:
         # Otherwise use the default strategy
         return options.default_strategy
     
-    async def _apply_redaction_strategy(self, 
-                                       text: str, 
-                                       strategy: RedactionStrategy,
-                                       pii_type: PIIType, 
-                                       options: RedactionOptions) -> Tuple[str, Dict[str, Any]]:
+    def _apply_redaction_strategy(self, 
+                                 text: str, 
+                                 strategy: RedactionStrategy,
+                                 pii_type: PIIType, 
+                                 options: RedactionOptions) -> Tuple[str, Dict[str, Any]]:
         """
-        Apply a redaction strategy to text
+        Apply a redaction strategy to text (custom replacements are handled by redact_text)
         
         Args:
             text: Text to redact
@@ -145,15 +287,6 @@ class RedactionService:
         Returns:
             Tuple of (redacted_text, metadata)
         """
-        metadata = {"strategy": strategy}
-        
-        # Check for custom replacement
-        if pii_type in options.custom_replacements:
-            return options.custom_replacements[pii_type], {
-                "strategy": strategy, 
-                "method": "custom_replacement"
-            }
-        
         # Apply the specified strategy
         if strategy == RedactionStrategy.FULL_REMOVAL:
             return "", {"strategy": strategy, "method": "full_removal"}
@@ -189,7 +322,7 @@ class RedactionService:
             }
             
         elif strategy == RedactionStrategy.PSEUDONYMIZATION:
-            pseudonym = await self._pseudonymize(text, pii_type)
+            pseudonym = self._pseudonymize(text, pii_type)
             return pseudonym, {
                 "strategy": strategy, 
                 "method": "pseudonymization"
@@ -210,90 +343,11 @@ class RedactionService:
         mask_char = options.mask_char or "X"
         
         # Special handling for different PII types
-        if pii_type == PIIType.CREDIT_CARD:
-            # Mask all but last 4 digits (e.g., XXXX-XXXX-XXXX-1234)
-            digits = ''.join(c for c in text if c.isdigit())
-            if len(digits) >= 4:
-                visible = digits[-4:]
-                mask_length = len(digits) - 4
-                masked_part = mask_char * mask_length
-                
-                if options.preserve_format and any(c in text for c in ['-', ' ']):
-                    # Try to preserve format (e.g., XXXX-XXXX-XXXX-1234)
-                    result = ''
-                    digit_index = 0
-                    for char in text:
-                        if char.isdigit():
-                            if digit_index < mask_length:
-                                result += mask_char
-                            else:
-                                result += char
-                            digit_index += 1
-                        else:
-                            result += char
-                    return result
-                else:
-                    return masked_part + visible
-            
-        elif pii_type == PIIType.SSN:
-            # Mask SSN as XXX-XX-1234
-            digits = ''.join(c for c in text if c.isdigit())
-            if len(digits) == 9:
-                if options.preserve_format and '-' in text:
-                    return f"{mask_char * 3}-{mask_char * 2}-{digits[-4:]}"
-                else:
-                    return f"{mask_char * 5}{digits[-4:]}"
-        
-        elif pii_type == PIIType.PHONE:
-            # Mask phone as (XXX) XXX-1234 or similar
-            digits = ''.join(c for c in text if c.isdigit())
-            if len(digits) >= 4:
-                visible = digits[-4:]
-                mask_length = len(digits) - 4
-                
-                if options.preserve_format:
-                    result = ''
-                    digit_index = 0
-                    for char in text:
-                        if char.isdigit():
-                            if digit_index < mask_length:
-                                result += mask_char
-                            else:
-                                result += char
-                            digit_index += 1
-                        else:
-                            result += char
-                    return result
-                else:
-                    return f"{mask_char * mask_length}{visible}"
-        
-        elif pii_type == PIIType.EMAIL:
-            # Mask as x***@domain.com
-            if '@' in text:
-                username, domain = text.split('@', 1)
-                if len(username) > 1:
-                    masked_username = username[0] + mask_char * (len(username) - 1)
-                    return f"{masked_username}@{domain}"
-        
-        elif pii_type == PIIType.PERSON_NAME:
-            # Mask as J*** D**
-            name_parts = text.split()
-            if len(name_parts) >= 2:
-                first = name_parts[0]
-                last = name_parts[-1]
-                middle = name_parts[1:-1] if len(name_parts) > 2 else []
-                
-                masked_first = first[0] + mask_char * (len(first) - 1)
-                masked_last = last[0] + mask_char * (len(last) - 1)
-                
-                masked_middle = []
-                for part in middle:
-                    if len(part) > 1:
-                        masked_middle.append(part[0] + mask_char * (len(part) - 1))
-                    else:
-                        masked_middle.append(part)
-                
-                return " ".join([masked_first] + masked_middle + [masked_last])
+        masker = _PARTIAL_MASKERS.get(pii_type)
+        if masker is not None:
+            masked = masker(text, mask_char, options.preserve_format)
+            if masked is not None:
+                return masked
         
         # Default: mask all but first and last character
         if len(text) > 2:
@@ -304,23 +358,22 @@ class RedactionService:
             return mask_char * len(text)
     
     def _tokenize(self, text: str, options: RedactionOptions) -> Tuple[str, bool]:
-        """Tokenize text using reversible encryption"""
+        """Tokenize text with a deterministic keyed hash"""
         try:
-            # Generate a deterministic token based on the text
             if options.tokenization_key:
-                # Use provided key for encryption (reversible)
-                encrypted = self.cipher.encrypt(text.encode())
-                token = f"TOK_{base64.urlsafe_b64encode(encrypted).decode()[:15]}"
-                return token, True
+                # Keyed with the service's token subkey; the token is a fixed-length
+                # digest and cannot be turned back into the value
+                hash_obj = hashlib.blake2b(text.encode(), digest_size=12, key=self._token_key)
+                return f"TOK_{base64.urlsafe_b64encode(hash_obj.digest()).decode()[:15]}", False
             else:
                 # No key, use one-way hash (non-reversible)
-                hash_obj = hashlib.sha256(text.encode())
-                return f"TOK_{hash_obj.hexdigest()[:15]}", False
+                hash_obj = hashlib.blake2b(text.encode(), digest_size=8, key=self._hash_key)
+                return f"TOK_{hash_obj.hexdigest()}", False
         except Exception as e:
             logger.error(f"Tokenization error: {e}")
             return f"TOK_ERROR_{uuid.uuid4().hex[:8]}", False
     
-    async def _pseudonymize(self, text: str, pii_type: PIIType) -> str:
+    def _pseudonymize(self, text: str, pii_type: PIIType) -> str:
         """Replace with realistic but fake data based on type"""
         # In a real implementation, this could use a service or database of fake data
         # Here, we'll use simple replacements for demonstration
@@ -336,49 +389,26 @@ class RedactionService:
             return f"user{uuid.uuid4().hex[:8]}@example.com"
             
         elif pii_type == PIIType.PHONE:
-            return f"(555) 000-{secrets.randbelow(10000):04d}"
+            return f"(555) 000-{_rng.randrange(10000):04d}"
             
         elif pii_type == PIIType.ADDRESS:
-            return f"{secrets.randbelow(1000)} Main Street, Anytown, USA"
+            return f"{_rng.randrange(1000)} Main Street, Anytown, USA"
         
         # For other types, return a placeholder
         return f"PSEUDONYM_{pii_type.value}_{uuid.uuid4().hex[:8]}"
     
     def _generalize(self, text: str, pii_type: PIIType) -> str:
         """Replace with more general category"""
-        if pii_type == PIIType.PERSON_NAME:
-            return "[PERSON]"
-        elif pii_type == PIIType.EMAIL:
-            return "[EMAIL]"
-        elif pii_type == PIIType.PHONE:
-            return "[PHONE NUMBER]"
-        elif pii_type == PIIType.ADDRESS:
-            return "[ADDRESS]"
-        elif pii_type == PIIType.CREDIT_CARD:
-            return "[PAYMENT CARD]"
-        elif pii_type == PIIType.SSN:
-            return "[SSN]"
-        elif pii_type == PIIType.PASSPORT:
-            return "[PASSPORT]"
-        elif pii_type == PIIType.DRIVERS_LICENSE:
-            return "[DRIVER'S LICENSE]"
-        elif pii_type == PIIType.DATE_OF_BIRTH:
-            return "[DOB]"
-        elif pii_type == PIIType.BANK_ACCOUNT:
-            return "[BANK ACCOUNT]"
-        else:
-            return f"[{pii_type.value.upper()}]"
+        label = _GENERALIZED_LABELS.get(pii_type)
+        return label if label is not None else f"[{pii_type.value.upper()}]"
     
     def _get_fake_name(self, first_only=False) -> str:
         """Generate a fake name"""
-        first_names = ["John", "Jane", "Alex", "Sam", "Taylor", "Morgan", "Jordan", "Casey"]
-        last_names = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Miller", "Davis"]
-        
-        first = secrets.choice(first_names)
+        first = _rng.choice(_FAKE_FIRST_NAMES)
         if first_only:
             return first
         else:
-            return f"{first} {secrets.choice(last_names)}"
+            return f"{first} {_rng.choice(_FAKE_LAST_NAMES)}"
     
     async def process_detection_result(self, 
                                      result: PIIDetectionResult, 
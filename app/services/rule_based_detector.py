@@ -1,7 +1,39 @@
 import re
-from typing import List, Dict, Pattern
+import asyncio
+import logging
+import threading
+from ipaddress import ip_address
+from functools import lru_cache
+from typing import List, Dict, Pattern, Optional, Tuple, FrozenSet
 from app.services.detection_pipeline import BaseDetector, DetectionCandidate, EntityType
 
+logger = logging.getLogger(__name__)
+
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
+
+# Texts at least this long are scanned in a worker thread so the event loop stays free
+_THREAD_SCAN_MIN_CHARS = 32768
+
+# ASCII control characters that \s matches in str patterns but not in bytes patterns
+_STR_ONLY_SPACE_RE = re.compile(r'[\x1c-\x1f]')
+
+# Formatting stripped from candidates before validation
+_SEPARATOR_RE = re.compile(r'[-\s]')
+_SSN_LABEL_RE = re.compile(r'SSN:?\s*', re.IGNORECASE)
+
+# Digit sum of 2*d for each digit d, used for every second digit in the Luhn check
+_LUHN_DOUBLED = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+
+def _luhn_valid(digits: str) -> bool:
+    """Luhn checksum over a string of decimal digits"""
+    checksum = sum(map(int, digits[-1::-2]))
+    checksum += sum(_LUHN_DOUBLED[d] for d in map(int, digits[-2::-2]))
+    return checksum % 10 == 0
+
 class RegexPattern:
     """Holds a regex pattern with metadata"""
     def __init__(self, pattern: str, entity_type: EntityType, confidence: float = 0.9, flags: int = 0):
@@ -15,6 +47,93 @@ class RuleBasedDetector(BaseDetector):
     def __init__(self):
         super().__init__("rule_based")
         self.patterns = self._initialize_patterns()
+        self._group_meta, self._mega = self._build_union(self.patterns)
+        # The patterns are ASCII, so pure-ASCII text can be scanned as bytes, which re does faster
+        self._mega_bytes = (
+            re.compile(self._mega.pattern.encode("ascii"), self._mega.flags & ~re.UNICODE)
+            if self._mega else None
+        )
+        self._hs_db, self._hs_groups, self._hs_unfiltered = self._build_hyperscan(self.patterns)
+        self._hs_local = threading.local()
+        self._patterns_for = lru_cache(maxsize=64)(self._select_patterns)
+    
+    @staticmethod
+    def _build_union(patterns: List[RegexPattern]) -> Tuple[Dict[str, int], Optional[Pattern]]:
+        """Join all patterns into one named-group alternation used to skip texts nothing matches"""
+        group_meta = {f"p{i}": i for i in range(len(patterns))}
+        flags = {p.pattern.flags for p in patterns}
+        if len(flags) > 1:
+            logger.warning("Patterns use different flags, skipping the combined pattern")
+            return group_meta, None
+        try:
+            mega = re.compile("|".join(
+                f"(?P<p{i}>{p.pattern.pattern})" for i, p in enumerate(patterns)
+            ), flags.pop() if flags else 0)
+        except re.error as e:
+            logger.warning(f"Could not build combined pattern, scanning per pattern: {e}")
+            return group_meta, None
+        return group_meta, mega
+    
+    @staticmethod
+    def _build_hyperscan(patterns: List[RegexPattern]):
+        """Compile every pattern into one Hyperscan database used to prefilter the text"""
+        if not HYPERSCAN_AVAILABLE:
+            return None, [], frozenset()
+        
+        flags = (hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_PREFILTER |
+                 hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP)
+        expressions, groups, unfiltered = [], [], set()
+        for i, p in enumerate(patterns):
+            if p.pattern.flags != re.UNICODE:
+                # The database is compiled without re's flags, so it could miss these
+                unfiltered.add(f"p{i}")
+                continue
+            expression = p.pattern.pattern.encode("utf-8")
+            try:
+                hyperscan.Database().compile(expressions=[expression], flags=[flags])
+            except Exception:
+                # Patterns Hyperscan rejects are always handed to re
+                unfiltered.add(f"p{i}")
+                continue
+            expressions.append(expression)
+            groups.append(f"p{i}")
+        
+        if not expressions:
+            return None, [], frozenset(unfiltered)
+        
+        try:
+            db = hyperscan.Database()
+            db.compile(
+                expressions=expressions,
+                ids=list(range(len(expressions))),
+                elements=len(expressions),
+                flags=[flags] * len(expressions)
+            )
+        except Exception as e:
+            logger.warning(f"Hyperscan prefilter disabled: {e}")
+            return None, [], frozenset(unfiltered)
+        return db, groups, frozenset(unfiltered)
+    
+    def _hyperscan_groups(self, data: bytes) -> FrozenSet[str]:
+        """Return the group names of the patterns that may match the UTF-8 encoded text"""
+        scratch = getattr(self._hs_local, "scratch", None)
+        if scratch is None:
+            # Scratch space is not thread-safe, so each worker thread gets its own
+            scratch = self._hs_local.scratch = hyperscan.Scratch(self._hs_db)
+        
+        found = set(self._hs_unfiltered)
+        
+        def on_match(pattern_id, start, end, flags, context):
+            found.add(self._hs_groups[pattern_id])
+        
+        self._hs_db.scan(data, match_event_handler=on_match, scratch=scratch)
+        return frozenset(found)
+    
+    def _select_patterns(self, groups: FrozenSet[str]) -> Tuple[RegexPattern, ...]:
+        """The patterns named in groups, keeping their original order"""
+        return tuple(
+            self.patterns[index] for name, index in self._group_meta.items() if name in groups
+        )
     
     def _initialize_patterns(self) -> List[RegexPattern]:
         """Initialize regex patterns for various PII types"""
@@ -71,13 +190,14 @@ class RuleBasedDetector(BaseDetector):
             patterns.append(RegexPattern(pattern, EntityType.IP_ADDRESS, 0.90))
         
         # URL patterns
-        url_pattern = r'https?://(?:[-\w.])+(?:[:\d]+)?(?:/(?:[\w/_.])*(?:\?(?:[\w&=%.])*)?(?:#(?:[\w.])*)?)?'
+        url_pattern = r'https?://[-\w.]{1,256}(?:[:\d]+)?(?:/[\w/_.]{0,2048}(?:\?[\w&=%.]{0,2048})?(?:#[\w.]{0,256})?)?'
         patterns.append(RegexPattern(url_pattern, EntityType.URL, 0.85))
         
-        # Address patterns (basic)
+        # Address patterns (basic). Name runs are bounded so long letter/space
+        # runs cannot backtrack quadratically
         address_patterns = [
-            r'\b\d+\s+[A-Za-z\s]+(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Lane|Ln|Drive|Dr)\b',
-            r'\b\d+\s+[A-Za-z\s]+,\s*[A-Za-z\s]+,\s*[A-Z]{2}\s*\d{5}(-\d{4})?\b'  # Street, City, State ZIP
+            r'\b\d+\s+[A-Za-z\s]{1,60}(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Lane|Ln|Drive|Dr)\b',
+            r'\b\d+\s+[A-Za-z\s]{1,60},\s*[A-Za-z\s]{1,60},\s*[A-Z]{2}\s*\d{5}(-\d{4})?\b'  # Street, City, State ZIP
         ]
         for pattern in address_patterns:
             patterns.append(RegexPattern(pattern, EntityType.ADDRESS, 0.70))
@@ -86,31 +206,55 @@ class RuleBasedDetector(BaseDetector):
     
     async def detect(self, text: str, **kwargs) -> List[DetectionCandidate]:
         """Detect PII using regex patterns"""
-        candidates = []
-        
-        for regex_pattern in self.patterns:
-            matches = regex_pattern.pattern.finditer(text)
-            
-            for match in matches:
-                # Additional validation for some types
-                if self._validate_match(match.group(), regex_pattern.entity_type):
-                    candidate = DetectionCandidate(
-                        id=None,  # Will be auto-generated
-                        type=regex_pattern.entity_type,
-                        text=match.group(),
-                        bbox=None,  # Will be set later with OCR data
-                        confidence=regex_pattern.confidence,
-                        start_char=match.start(),
-                        end_char=match.end(),
-                        source=self.name,
-                        metadata={
-                            "pattern": regex_pattern.pattern.pattern,
-                            "validation_passed": True
-                        }
-                    )
-                    candidates.append(candidate)
+        if len(text) >= _THREAD_SCAN_MIN_CHARS:
+            return await asyncio.to_thread(self._scan, text)
+        return self._scan(text)
+    
+    def _scan(self, text: str) -> List[DetectionCandidate]:
+        """Run every pattern that can fire over text and return the validated matches"""
+        patterns = self.patterns
+        if self._hs_db is not None:
+            # Hyperscan reports a superset of the patterns re can match, so the
+            # ones it rules out can be dropped without changing the result
+            groups = self._hyperscan_groups(text.encode("utf-8"))
+            if len(groups) < len(self._group_meta):
+                patterns = self._patterns_for(groups)
+        elif self._mega is not None:
+            # One pass of the combined pattern tells whether anything matches at all.
+            # Byte offsets equal character offsets for ASCII text, and re scans bytes faster
+            if text.isascii() and _STR_ONLY_SPACE_RE.search(text) is None:
+                found = self._mega_bytes.search(text.encode("ascii"))
+            else:
+                found = self._mega.search(text)
+            if found is None:
+                return []
         
-        return candidates
+        # Each pattern runs on its own so overlapping matches of different
+        # patterns (an email inside a URL, say) are all reported
+        return [
+            self._make_candidate(match.group(), match.start(), match.end(), regex_pattern)
+            for regex_pattern in patterns
+            for match in regex_pattern.pattern.finditer(text)
+            if self._validate_match(match.group(), regex_pattern.entity_type)
+        ]
+    
+    def _make_candidate(self, value: str, start: int, end: int,
+                        regex_pattern: RegexPattern) -> DetectionCandidate:
+        """Build a detection candidate from a validated match"""
+        return DetectionCandidate(
+            id=None,  # Will be auto-generated
+            type=regex_pattern.entity_type,
+            text=value,
+            bbox=None,  # Will be set later with OCR data
+            confidence=regex_pattern.confidence,
+            start_char=start,
+            end_char=end,
+            source=self.name,
+            metadata={
+                "pattern": regex_pattern.pattern.pattern,
+                "validation_passed": True
+            }
+        )
     
     def _validate_match(self, text: str, entity_type: EntityType) -> bool:
         """Additional validation for certain entity types"""
@@ -127,31 +271,23 @@ class RuleBasedDetector(BaseDetector):
     def _validate_credit_card(self, card_number: str) -> bool:
         """Validate credit card using Luhn algorithm"""
         # Remove spaces and hyphens
-        digits = re.sub(r'[-\s]', '', card_number)
+        digits = _SEPARATOR_RE.sub('', card_number)
         
-        if not digits.isdigit():
+        # Card numbers are 13-19 digits; anything else cannot pass Luhn meaningfully
+        if not 13 <= len(digits) <= 19 or not digits.isdigit():
             return False
         
-        # Luhn algorithm
-        def luhn_checksum(card_num):
-            def digits_of(n):
-                return [int(d) for d in str(n)]
-            
-            digits = digits_of(card_num)
-            odd_digits = digits[-1::-2]
-            even_digits = digits[-2::-2]
-            checksum = sum(odd_digits)
-            for d in even_digits:
-                checksum += sum(digits_of(d * 2))
-            return checksum % 10
-        
-        return luhn_checksum(digits) == 0
+        return _luhn_valid(digits)
     
     def _validate_ssn(self, ssn: str) -> bool:
         """Basic SSN validation"""
-        # Remove formatting
-        digits = re.sub(r'[-\s]', '', ssn)
-        digits = re.sub(r'SSN:?\s*', '', digits, flags=re.IGNORECASE)
+        if len(ssn) < 9:
+            return False
+        
+        # Remove formatting; only the labelled pattern can start with a letter
+        digits = _SEPARATOR_RE.sub('', ssn)
+        if not digits[:1].isdigit():
+            digits = _SSN_LABEL_RE.sub('', digits)
         
         if len(digits) != 9 or not digits.isdigit():
             return False
@@ -167,16 +303,9 @@ class RuleBasedDetector(BaseDetector):
         return True
     
     def _validate_ip_address(self, ip: str) -> bool:
-        """Validate IPv4 address"""
-        parts = ip.split('.')
-        if len(parts) != 4:
-            return False
-        
+        """Validate IPv4 or IPv6 address"""
         try:
-            for part in parts:
-                num = int(part)
-                if not (0 <= num <= 255):
-                    return False
+            ip_address(ip)
             return True
         except ValueError:
             return False
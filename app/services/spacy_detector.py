@@ -1,18 +1,119 @@
 import spacy
 from spacy.tokens import Doc, Span
-from typing import List, Optional
+from spacy.attrs import ENT_IOB, ENT_TYPE
+from typing import Iterator, List, Optional, Tuple
+from functools import lru_cache
+import asyncio
+import re
+import numpy as np
 import logging
 from app.services.detection_pipeline import BaseDetector, DetectionCandidate, EntityType
 
 logger = logging.getLogger(__name__)
 
+# Words near an entity that make its label more likely, by spaCy label
+_PERSON_INDICATORS = frozenset({"mr", "mrs", "ms", "dr", "prof", "ceo", "manager", "director"})
+_ORG_INDICATORS = frozenset({"inc", "llc", "corp", "company", "ltd", "university", "college"})
+_LOCATION_INDICATORS = frozenset({"in", "at", "from", "to", "near", "city", "state", "country"})
+_CONTEXT_INDICATORS = {
+    "PERSON": _PERSON_INDICATORS,
+    "ORG": _ORG_INDICATORS,
+    "GPE": _LOCATION_INDICATORS,
+    "LOC": _LOCATION_INDICATORS,
+}
+
+# Title-case words that start sentences rather than names
+_COMMON_NAME_STOPWORDS = frozenset({
+    "The", "This", "That", "When", "Where", "What", "How", "And", "Or", "But", "If"
+})
+
+# Words that suggest a noun chunk is part of an address
+_ADDRESS_RE = re.compile(
+    r'\b(?:street|st|avenue|ave|road|rd|boulevard|blvd|lane|ln|drive|dr|suite|apt|floor)\b',
+    re.IGNORECASE
+)
+
+@lru_cache(maxsize=4096)
+def _looks_like_name_text(text: str) -> bool:
+    """Name heuristic on the token text; the same words recur throughout a corpus"""
+    # Basic checks
+    if len(text) < 2 or not text.istitle():
+        return False
+    
+    # Common name patterns
+    if text.isalpha() and len(text) >= 2:
+        # Check if it's not a common word
+        return text not in _COMMON_NAME_STOPWORDS
+    
+    return False
+
+class _PipeBatcher:
+    """Collects concurrent parse requests and runs them through nlp.pipe together"""
+    
+    def __init__(self, nlp, batch_size: int = 64, max_wait: float = 0.005):
+        self.nlp = nlp
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._loop = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+    
+    async def parse(self, text: str) -> Doc:
+        """Parse text, sharing a pipe() call with any requests arriving at the same time"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            # Queues and tasks belong to one event loop, so start fresh on a new one
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        
+        future = loop.create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[Tuple[str, asyncio.Future]] = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            texts = [text for text, _ in batch]
+            try:
+                # The model runs off the event loop; this worker is its only caller
+                docs = await asyncio.to_thread(lambda: list(self.nlp.pipe(texts, batch_size=self.batch_size)))
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), doc in zip(batch, docs):
+                if not future.done():
+                    future.set_result(doc)
+
 class SpacyNERDetector(BaseDetector):
     """spaCy-based Named Entity Recognition detector"""
     
-    def __init__(self, model_name: str = "en_core_web_sm"):
+    # Pipeline components this detector never reads. The attribute_ruler stays,
+    # as it maps tags to the POS values the name heuristics use
+    _excluded_pipes = ("lemmatizer",)
+    
+    def __init__(self, model_name: str = "en_core_web_sm", use_gpu: bool = False, gpu_id: int = 0):
         super().__init__("spacy_ner")
         self.model_name = model_name
+        self.use_gpu = use_gpu
+        self.gpu_id = gpu_id
         self.nlp = None
+        self._batcher: Optional[_PipeBatcher] = None
+        self._has_lemmas = False
         self._entity_mapping = {
             "PERSON": EntityType.PERSON,
             "ORG": EntityType.ORGANIZATION,
@@ -23,12 +124,24 @@ class SpacyNERDetector(BaseDetector):
             "MONEY": EntityType.CUSTOM,
             "PERCENT": EntityType.CUSTOM,
         }
+        # Only mapped labels become candidates, so their glossary entries are looked up once
+        self._label_explanations = {label: spacy.explain(label) for label in self._entity_mapping}
         self._load_model()
     
     def _load_model(self):
         """Load spaCy model"""
+        if self.use_gpu:
+            # Must run before loading so the model is allocated on the GPU
+            try:
+                spacy.require_gpu(gpu_id=self.gpu_id)
+                logger.info(f"spaCy running on GPU {self.gpu_id}")
+            except Exception as e:
+                logger.warning(f"GPU requested for spaCy but unavailable, using CPU: {e}")
+        
         try:
-            self.nlp = spacy.load(self.model_name)
+            self.nlp = spacy.load(self.model_name, exclude=list(self._excluded_pipes))
+            self._has_lemmas = self.nlp.has_pipe("lemmatizer")
+            self._batcher = _PipeBatcher(self.nlp)
             logger.info(f"Successfully loaded spaCy model: {self.model_name}")
         except OSError:
             logger.error(f"Failed to load spaCy model: {self.model_name}")
@@ -40,41 +153,50 @@ class SpacyNERDetector(BaseDetector):
         if not self.nlp or not self.enabled:
             return []
         
+        try:
+            # Process text with spaCy
+            doc = await self._parse(text)
+        except Exception as e:
+            logger.error(f"Error in spaCy NER detection: {e}")
+            return []
+        
+        return await self._detect_in_doc(doc)
+    
+    async def _parse(self, text: str) -> Doc:
+        """Parse text with the model, batched with concurrent requests"""
+        return await self._batcher.parse(text)
+    
+    async def _detect_in_doc(self, doc: Doc) -> List[DetectionCandidate]:
+        """Extract candidates from an already parsed document"""
         candidates = []
         
         try:
-            # Process text with spaCy
-            doc = self.nlp(text)
-            
             # Extract named entities
-            for ent in doc.ents:
-                entity_type = self._map_spacy_label(ent.label_)
+            for ent, entity_type in self._mapped_entities(doc):
+                # Calculate confidence based on spaCy's internal confidence
+                # spaCy doesn't provide confidence scores directly, so we estimate
+                confidence = self._calculate_confidence(ent, doc)
                 
-                if entity_type:
-                    # Calculate confidence based on spaCy's internal confidence
-                    # spaCy doesn't provide confidence scores directly, so we estimate
-                    confidence = self._calculate_confidence(ent, doc)
-                    
-                    candidate = DetectionCandidate(
-                        id=None,
-                        type=entity_type,
-                        text=ent.text,
-                        bbox=None,
-                        confidence=confidence,
-                        start_char=ent.start_char,
-                        end_char=ent.end_char,
-                        source=self.name,
-                        metadata={
-                            "spacy_label": ent.label_,
-                            "spacy_explanation": spacy.explain(ent.label_),
-                            "lemma": ent.lemma_,
-                            "pos_tags": [token.pos_ for token in ent],
-                            "is_alpha": ent.text.isalpha(),
-                            "is_title": ent.text.istitle()
-                        }
-                    )
-                    candidates.append(candidate)
-            
+                candidate = DetectionCandidate(
+                    id=None,
+                    type=entity_type,
+                    text=ent.text,
+                    bbox=None,
+                    confidence=confidence,
+                    start_char=ent.start_char,
+                    end_char=ent.end_char,
+                    source=self.name,
+                    metadata={
+                        "spacy_label": ent.label_,
+                        "spacy_explanation": self._label_explanations.get(ent.label_),
+                        "lemma": ent.lemma_ if self._has_lemmas else ent.text,
+                        "pos_tags": [token.pos_ for token in ent],
+                        "is_alpha": ent.text.isalpha(),
+                        "is_title": ent.text.istitle()
+                    }
+                )
+                candidates.append(candidate)
+        
             # Additional processing for custom entities
             candidates.extend(await self._detect_custom_patterns(doc))
             
@@ -83,6 +205,23 @@ class SpacyNERDetector(BaseDetector):
         
         return candidates
     
+    def _mapped_entities(self, doc: Doc) -> Iterator[Tuple[Span, EntityType]]:
+        """Yield the entities whose label maps to an EntityType, with that type"""
+        # Read IOB tags and labels as one array so unmapped entities never become Spans
+        tags = doc.to_array([ENT_IOB, ENT_TYPE])
+        if not len(tags):
+            return
+        # IOB codes: 3 = begins an entity, 1 = inside one
+        boundaries = np.flatnonzero(tags[:, 0] != 1)
+        for start in np.flatnonzero(tags[:, 0] == 3):
+            label_id = int(tags[start, 1])
+            entity_type = self._map_spacy_label(doc.vocab.strings[label_id])
+            if entity_type is None:
+                continue
+            following = np.searchsorted(boundaries, start, side="right")
+            end = int(boundaries[following]) if following < len(boundaries) else len(doc)
+            yield Span(doc, int(start), end, label=label_id), entity_type
+    
     def _map_spacy_label(self, spacy_label: str) -> Optional[EntityType]:
         """Map spaCy entity labels to our EntityType enum"""
         return self._entity_mapping.get(spacy_label)
@@ -95,93 +234,75 @@ class SpacyNERDetector(BaseDetector):
         # Boost confidence based on various factors
         confidence_boost = 0.0
         
+        # Span.text and Span.label_ build new strings on each access
+        text = ent.text
+        label = ent.label_
+        
         # Length factor (longer entities are often more reliable)
-        if len(ent.text) > 2:
+        if len(text) > 2:
             confidence_boost += 0.05
         
         # Title case boost for PERSON and ORG
-        if ent.label_ in ["PERSON", "ORG"] and ent.text.istitle():
+        if label in ("PERSON", "ORG") and text.istitle():
             confidence_boost += 0.10
         
-        # Context-based boost
-        if self._has_strong_context(ent, doc):
+        # Context-based boost, only possible for labels with context indicators
+        if label in _CONTEXT_INDICATORS and self._has_strong_context(ent, doc):
             confidence_boost += 0.10
         
         # All caps penalty (might be acronym or noise)
-        if ent.text.isupper() and len(ent.text) > 1:
+        if text.isupper() and len(text) > 1:
             confidence_boost -= 0.05
         
         return min(base_confidence + confidence_boost, 1.0)
     
     def _has_strong_context(self, ent: Span, doc: Doc) -> bool:
         """Check if entity has strong contextual indicators"""
+        indicators = _CONTEXT_INDICATORS.get(ent.label_)
+        if indicators is None:
+            return False
+        
         # Look for common prefixes/suffixes
         context_window = 3
         start_idx = max(0, ent.start - context_window)
         end_idx = min(len(doc), ent.end + context_window)
         
-        context_tokens = [token.text.lower() for token in doc[start_idx:end_idx]]
-        
-        person_indicators = ["mr", "mrs", "ms", "dr", "prof", "ceo", "manager", "director"]
-        org_indicators = ["inc", "llc", "corp", "company", "ltd", "university", "college"]
-        location_indicators = ["in", "at", "from", "to", "near", "city", "state", "country"]
-        
-        if ent.label_ == "PERSON":
-            return any(indicator in context_tokens for indicator in person_indicators)
-        elif ent.label_ == "ORG":
-            return any(indicator in context_tokens for indicator in org_indicators)
-        elif ent.label_ in ["GPE", "LOC"]:
-            return any(indicator in context_tokens for indicator in location_indicators)
-        
-        return False
+        return any(token.lower_ in indicators for token in doc[start_idx:end_idx])
     
     async def _detect_custom_patterns(self, doc: Doc) -> List[DetectionCandidate]:
         """Detect additional patterns using spaCy's linguistic features"""
         candidates = []
         
         # Detect potential names using POS tags and dependency parsing
-        for sent in doc.sents:
-            for token in sent:
-                # Potential person names (proper nouns with specific patterns)
-                if (token.pos_ == "PROPN" and 
-                    token.ent_type_ == "" and  # Not already tagged by NER
-                    self._looks_like_name(token)):
-                    
-                    candidate = DetectionCandidate(
-                        id=None,
-                        type=EntityType.PERSON,
-                        text=token.text,
-                        bbox=None,
-                        confidence=0.6,  # Lower confidence for pattern-based detection
-                        start_char=token.idx,
-                        end_char=token.idx + len(token.text),
-                        source=f"{self.name}_patterns",
-                        metadata={
-                            "detection_method": "pos_pattern",
-                            "pos": token.pos_,
-                            "dep": token.dep_,
-                            "is_title": token.text.istitle()
-                        }
-                    )
-                    candidates.append(candidate)
+        for token in doc:
+            # Potential person names (proper nouns with specific patterns)
+            if (token.pos_ == "PROPN" and 
+                token.ent_type_ == "" and  # Not already tagged by NER
+                self._looks_like_name(token)):
+                
+                candidate = DetectionCandidate(
+                    id=None,
+                    type=EntityType.PERSON,
+                    text=token.text,
+                    bbox=None,
+                    confidence=0.6,  # Lower confidence for pattern-based detection
+                    start_char=token.idx,
+                    end_char=token.idx + len(token.text),
+                    source=f"{self.name}_patterns",
+                    metadata={
+                        "detection_method": "pos_pattern",
+                        "pos": token.pos_,
+                        "dep": token.dep_,
+                        "is_title": token.text.istitle()
+                    }
+                )
+                candidates.append(candidate)
         
         return candidates
     
     def _looks_like_name(self, token) -> bool:
         """Heuristic to identify potential names"""
-        text = token.text
-        
-        # Basic checks
-        if len(text) < 2 or not text.istitle():
-            return False
-        
-        # Common name patterns
-        if text.isalpha() and len(text) >= 2:
-            # Check if it's not a common word
-            common_words = {"The", "This", "That", "When", "Where", "What", "How"}
-            return text not in common_words
-        
-        return False
+        return _looks_like_name_text(token.text)
     
     def get_supported_types(self) -> List[EntityType]:
         """Return supported entity types"""
@@ -208,8 +329,20 @@ class SpacyNERDetector(BaseDetector):
 class EnhancedSpacyDetector(SpacyNERDetector):
     """Enhanced spaCy detector with additional linguistic analysis"""
     
-    def __init__(self, model_name: str = "en_core_web_sm"):
-        super().__init__(model_name)
+    # Dependency analysis matches on token lemmas
+    _excluded_pipes = ()
+    
+    # Entity type implied by a context word
+    _context_mapping = {
+        "name": EntityType.PERSON,
+        "email": EntityType.EMAIL,
+        "phone": EntityType.PHONE,
+        "address": EntityType.ADDRESS,
+        "contact": EntityType.PERSON
+    }
+    
+    def __init__(self, model_name: str = "en_core_web_sm", use_gpu: bool = False, gpu_id: int = 0):
+        super().__init__(model_name, use_gpu=use_gpu, gpu_id=gpu_id)
         self.name = "enhanced_spacy"
         self._setup_custom_components()
     
@@ -232,13 +365,19 @@ class EnhancedSpacyDetector(SpacyNERDetector):
     
     async def detect(self, text: str, **kwargs) -> List[DetectionCandidate]:
         """Enhanced detection with additional analysis"""
-        candidates = await super().detect(text, **kwargs)
+        if not self.nlp or not self.enabled:
+            return []
         
-        if not self.nlp:
-            return candidates
+        try:
+            # One parse serves both the base NER pass and the additional analysis
+            doc = await self._parse(text)
+        except Exception as e:
+            logger.error(f"Error in spaCy NER detection: {e}")
+            return []
+        
+        candidates = await self._detect_in_doc(doc)
         
         # Additional analysis
-        doc = self.nlp(text)
         
         # Detect potential sensitive information using dependency parsing
         sensitive_candidates = await self._analyze_dependencies(doc)
@@ -254,49 +393,45 @@ class EnhancedSpacyDetector(SpacyNERDetector):
         """Analyze dependency trees for sensitive information"""
         candidates = []
         
-        for sent in doc.sents:
-            for token in sent:
-                # Look for patterns like "My name is John" or "Contact: john@email.com"
-                if token.lemma_.lower() in ["name", "email", "phone", "address", "contact"]:
-                    # Find the associated entity
-                    for child in token.children:
-                        if child.pos_ in ["PROPN", "NOUN"] or "@" in child.text:
-                            entity_type = self._infer_type_from_context(token.lemma_.lower())
-                            if entity_type:
-                                candidate = DetectionCandidate(
-                                    id=None,
-                                    type=entity_type,
-                                    text=child.text,
-                                    bbox=None,
-                                    confidence=0.7,
-                                    start_char=child.idx,
-                                    end_char=child.idx + len(child.text),
-                                    source=f"{self.name}_dependency",
-                                    metadata={
-                                        "detection_method": "dependency_parsing",
-                                        "context_word": token.text,
-                                        "dependency": child.dep_
-                                    }
-                                )
-                                candidates.append(candidate)
+        for token in doc:
+            # Look for patterns like "My name is John" or "Contact: john@email.com"
+            if token.lemma_.lower() in self._context_mapping:
+                # Find the associated entity
+                for child in token.children:
+                    if child.pos_ in ["PROPN", "NOUN"] or "@" in child.text:
+                        entity_type = self._infer_type_from_context(token.lemma_.lower())
+                        if entity_type:
+                            candidate = DetectionCandidate(
+                                id=None,
+                                type=entity_type,
+                                text=child.text,
+                                bbox=None,
+                                confidence=0.7,
+                                start_char=child.idx,
+                                end_char=child.idx + len(child.text),
+                                source=f"{self.name}_dependency",
+                                metadata={
+                                    "detection_method": "dependency_parsing",
+                                    "context_word": token.text,
+                                    "dependency": child.dep_
+                                }
+                            )
+                            candidates.append(candidate)
         
         return candidates
     
     def _infer_type_from_context(self, context: str) -> Optional[EntityType]:
         """Infer entity type from context words"""
-        context_mapping = {
-            "name": EntityType.PERSON,
-            "email": EntityType.EMAIL,
-            "phone": EntityType.PHONE,
-            "address": EntityType.ADDRESS,
-            "contact": EntityType.PERSON
-        }
-        return context_mapping.get(context.lower())
+        return self._context_mapping.get(context.lower())
     
     async def _detect_addresses(self, doc: Doc) -> List[DetectionCandidate]:
         """Detect addresses using compound noun phrases"""
         candidates = []
         
+        # Noun chunks need the dependency parse
+        if not doc.has_annotation("DEP"):
+            return candidates
+        
         for chunk in doc.noun_chunks:
             # Look for address-like patterns
             if self._looks_like_address(chunk):
@@ -321,9 +456,5 @@ class EnhancedSpacyDetector(SpacyNERDetector):
     
     def _looks_like_address(self, chunk: Span) -> bool:
         """Heuristic to identify potential addresses"""
-        text = chunk.text.lower()
-        address_indicators = ["street", "st", "avenue", "ave", "road", "rd", "boulevard", 
-                            "blvd", "lane", "ln", "drive", "dr", "suite", "apt", "floor"]
-        
         # Check if chunk contains address indicators
-        return any(indicator in text for indicator in address_indicators)
\ No newline at end of file
+        return _ADDRESS_RE.search(chunk.text) is not None
\ No newline at end of file
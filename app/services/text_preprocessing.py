@@ -9,20 +9,85 @@ import re
 import logging
 import unicodedata
 from dataclasses import dataclass, field
+from functools import lru_cache
 import json
+import numpy as np
 
-# Try to import optional dependencies
+# Try to import optional dependencies, preferring the compiled language detectors
+_LANG_SAMPLE_CHARS = 4000
 try:
-    from langdetect import detect as detect_language
-    from langdetect import DetectorFactory
-    # Make language detection deterministic
-    DetectorFactory.seed = 0
-    LANGUAGE_DETECTION_AVAILABLE = True
+    import gcld3
+    _DETECTOR = gcld3.NNetLanguageIdentifier(min_num_bytes=10, max_num_bytes=_LANG_SAMPLE_CHARS)
+    _LANG_BACKEND = "gcld3"
 except ImportError:
-    LANGUAGE_DETECTION_AVAILABLE = False
+    try:
+        from ftlangdetect import detect as _fasttext_detect
+        _LANG_BACKEND = "fasttext"
+    except ImportError:
+        try:
+            from langdetect import detect as _langdetect_detect
+            from langdetect import DetectorFactory
+            # Make language detection deterministic
+            DetectorFactory.seed = 0
+            _LANG_BACKEND = "langdetect"
+        except ImportError:
+            _LANG_BACKEND = None
+LANGUAGE_DETECTION_AVAILABLE = _LANG_BACKEND is not None
 
 logger = logging.getLogger(__name__)
 
+# Patterns used by the preprocessing steps, compiled once
+_PARAGRAPH_BREAK_RE = re.compile(r'\n\s*\n')
+_HORIZONTAL_WS_RE = re.compile(r'[ \t]+')
+
+# Characters that may be control characters: anything but tab, newline, carriage
+# return and printable ASCII. Only these need a Unicode category lookup
+_CONTROL_CANDIDATE_RE = re.compile(r'[^\t\n\r\x20-\x7e]')
+
+# Single-pass form of the remove_control_chars and normalize_whitespace steps
+_CONTROL_OR_WS_RE = re.compile(r'(?P<space>[ \t]+)|(?P<candidate>[^\t\n\r\x20-\x7e])')
+
+@lru_cache(maxsize=4096)
+def _is_control(char: str) -> bool:
+    """Whether char is in a Unicode "C" category; text reuses few distinct characters"""
+    return unicodedata.category(char)[0] == "C"
+
+@lru_cache(maxsize=4096)
+def _nfkc_char(char: str) -> str:
+    """NFKC form of a single character"""
+    return unicodedata.normalize('NFKC', char)
+
+# Common OCR error patterns and corrections. Single characters are mapped with
+# str.translate; the rest share one alternation, keyed by the matched text
+_OCR_CHAR_FIXES = {'，': ','}                # Full-width comma -> regular comma
+_OCR_CHAR_TABLE = str.maketrans(_OCR_CHAR_FIXES)
+_OCR_FIX_RE = re.compile(
+    r'l\b'        # Lowercase l at end of word -> 1
+    r'|\b0\b'     # Single 0 -> O
+    r'|rn'        # 'rn' -> 'm'
+    r'|S\$'       # S$ -> $
+)
+_OCR_REPLACEMENTS = {'l': '1', '0': 'O', 'rn': 'm', 'S$': '$'}
+
+# Common boilerplate patterns to remove, joined so the text is scanned once
+_BOILERPLATE_RE = re.compile("|".join(f"(?:{pattern})" for pattern in (
+    r'Page \d+ of \d+',
+    r'CONFIDENTIAL',
+    r'©\s*\d{4}.*\bAll rights reserved\b',
+    r'www\.[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}',
+    r'Powered by.*'
+)), re.IGNORECASE)
+
+@lru_cache(maxsize=256)
+def detect_language(sample: str) -> str:
+    """Language code of sample with the available backend; repeated texts are cached"""
+    if _LANG_BACKEND == "gcld3":
+        return _DETECTOR.FindLanguage(text=sample).language
+    if _LANG_BACKEND == "fasttext":
+        # fastText predicts line by line
+        return _fasttext_detect(text=sample.replace("\n", " "))["lang"]
+    return _langdetect_detect(sample)
+
 @dataclass
 class TextSegment:
     """Represents a segment of text with metadata"""
@@ -41,11 +106,14 @@ class ProcessedDocument:
     processed_text: str
     segments: List[TextSegment] = field(default_factory=list)
     metadata: Dict[str, Any] = field(default_factory=dict)
-    character_map: Dict[int, int] = field(default_factory=dict)
+    # Original position of each processed character, -1 where unknown
+    character_map: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
     
     def map_position(self, processed_pos: int) -> int:
         """Map a position in the processed text to a position in the original text"""
-        return self.character_map.get(processed_pos, -1)
+        if 0 <= processed_pos < len(self.character_map):
+            return int(self.character_map[processed_pos])
+        return -1
     
     def map_range(self, processed_start: int, processed_end: int) -> Tuple[int, int]:
         """Map a range in the processed text to a range in the original text"""
@@ -58,6 +126,26 @@ class ProcessedDocument:
             
         return (orig_start, orig_end)
 
+def _aligned_map(doc: ProcessedDocument) -> np.ndarray:
+    """Character map with exactly one entry per processed character"""
+    char_map = doc.character_map
+    length = len(doc.processed_text)
+    if len(char_map) >= length:
+        return char_map[:length]
+    # Steps that change the text without tracking positions leave the tail unmapped
+    return np.concatenate([char_map, np.full(length - len(char_map), -1, dtype=np.int32)])
+
+def _fuse_steps(steps: List[str]) -> List[str]:
+    """Steps to run, with control character removal directly followed by
+    whitespace normalization merged into their single-pass equivalent"""
+    planned = []
+    for step in steps:
+        if step == "normalize_whitespace" and planned and planned[-1] == "remove_control_chars":
+            planned[-1] = "clean_control_and_whitespace"
+        else:
+            planned.append(step)
+    return planned
+
 class TextPreprocessor:
     """Text preprocessing pipeline for PII detection"""
     
@@ -106,10 +194,10 @@ class TextPreprocessor:
         )
         
         # Build initial character map (1:1 mapping)
-        doc.character_map = {i: i for i in range(len(text))}
+        doc.character_map = np.arange(len(text), dtype=np.int32)
         
         # Apply each preprocessing step
-        for step in steps:
+        for step in _fuse_steps(steps):
             step_func = getattr(self, f"_step_{step}", None)
             if step_func:
                 try:
@@ -121,35 +209,75 @@ class TextPreprocessor:
         
         return doc
     
+    async def _step_clean_control_and_whitespace(self, doc: ProcessedDocument) -> ProcessedDocument:
+        """Remove control characters and normalize whitespace in a single pass"""
+        text = doc.processed_text
+        
+        pieces = []
+        keep = None
+        removed_count = 0
+        prev = 0
+        # Whether the last emitted character is a space that a following run joins
+        after_space = False
+        for match in _CONTROL_OR_WS_RE.finditer(text):
+            start, end = match.span()
+            if start != prev:
+                after_space = False
+            pieces.append(text[prev:start])
+            prev = end
+            
+            if match.lastgroup == "candidate":
+                if _is_control(match.group()):
+                    removed_count += 1
+                    if keep is None:
+                        keep = np.ones(len(text), dtype=bool)
+                    keep[start] = False
+                else:
+                    pieces.append(match.group())
+                    after_space = False
+                continue
+            
+            # A run of spaces and tabs becomes one space at the run's first character,
+            # or disappears if only removed control characters separate it from the last
+            drop_from = start if after_space else start + 1
+            if drop_from < end:
+                if keep is None:
+                    keep = np.ones(len(text), dtype=bool)
+                keep[drop_from:end] = False
+            if not after_space:
+                pieces.append(' ')
+            after_space = True
+        pieces.append(text[prev:])
+        
+        if keep is not None:
+            doc.character_map = _aligned_map(doc)[keep]
+        doc.processed_text = "".join(pieces)
+        doc.metadata["removed_control_chars"] = removed_count
+        
+        return doc
+    
     async def _step_remove_control_chars(self, doc: ProcessedDocument) -> ProcessedDocument:
         """Remove control characters from text"""
         text = doc.processed_text
-        result = ""
-        new_map = {}
-        
-        # Index in the processed text
-        p_idx = 0
-        # Index in the result text
-        r_idx = 0
-        
-        for char in text:
-            # Skip control characters except whitespace
-            if unicodedata.category(char)[0] == "C" and char not in (" ", "\t", "\n", "\r"):
-                p_idx += 1
-                continue
-                
-            result += char
-            # Map the position in the result to the original text
-            orig_pos = doc.character_map.get(p_idx, -1)
-            if orig_pos != -1:
-                new_map[r_idx] = orig_pos
-                
-            p_idx += 1
-            r_idx += 1
         
-        doc.processed_text = result
-        doc.character_map = new_map
-        doc.metadata["removed_control_chars"] = p_idx - r_idx
+        # Skip control characters except whitespace
+        removed = [
+            match.start() for match in _CONTROL_CANDIDATE_RE.finditer(text)
+            if _is_control(match.group())
+        ]
+        
+        if removed:
+            # Map the positions in the result to the original text
+            doc.character_map = np.delete(_aligned_map(doc), removed)
+            
+            pieces = []
+            prev = 0
+            for pos in removed:
+                pieces.append(text[prev:pos])
+                prev = pos + 1
+            pieces.append(text[prev:])
+            doc.processed_text = "".join(pieces)
+        doc.metadata["removed_control_chars"] = len(removed)
         
         return doc
     
@@ -157,56 +285,19 @@ class TextPreprocessor:
         """Normalize whitespace in text"""
         text = doc.processed_text
         
-        # Replace multiple whitespace characters with a single space
-        # Preserve paragraph breaks (double newlines)
-        text = re.sub(r'\n\s*\n', '\n\n', text)  # Preserve paragraph breaks
-        text = re.sub(r'[ \t]+', ' ', text)      # Compress horizontal whitespace
-        text = re.sub(r' *\n *', '\n', text)     # Clean around newlines
-        
-        # Build new character map (this is complex with whitespace normalization)
-        # We'll need to track how the positions change
-        result = ""
-        new_map = {}
-        
-        p_idx = 0  # Position in the processed text
-        r_idx = 0  # Position in the result text
-        
-        # Process the text
-        i = 0
-        while i < len(doc.processed_text):
-            char = doc.processed_text[i]
-            
-            # Handle whitespace sequences
-            if char in (' ', '\t'):
-                # Check for whitespace sequence
-                ws_len = 1
-                j = i + 1
-                while j < len(doc.processed_text) and doc.processed_text[j] in (' ', '\t'):
-                    ws_len += 1
-                    j += 1
-                
-                # Add single space to result
-                result += ' '
-                # Map this position
-                orig_pos = doc.character_map.get(i, -1)
-                if orig_pos != -1:
-                    new_map[r_idx] = orig_pos
-                
-                # Skip the rest of the whitespace
-                i += ws_len
-                r_idx += 1
-            else:
-                # Normal character
-                result += char
-                orig_pos = doc.character_map.get(i, -1)
-                if orig_pos != -1:
-                    new_map[r_idx] = orig_pos
-                
-                i += 1
-                r_idx += 1
+        # Compress each run of spaces and tabs to a single space, which keeps the
+        # position of the run's first character
+        keep = None
+        for match in _HORIZONTAL_WS_RE.finditer(text):
+            start, end = match.span()
+            if end - start > 1:
+                if keep is None:
+                    keep = np.ones(len(text), dtype=bool)
+                keep[start + 1:end] = False
         
-        doc.processed_text = result
-        doc.character_map = new_map
+        if keep is not None:
+            doc.character_map = _aligned_map(doc)[keep]
+        doc.processed_text = _HORIZONTAL_WS_RE.sub(' ', text)
         
         return doc
     
@@ -214,31 +305,30 @@ class TextPreprocessor:
         """Normalize Unicode characters"""
         text = doc.processed_text
         
+        # ASCII and already-normalized text is left as is
+        if text.isascii() or unicodedata.is_normalized('NFKC', text):
+            return doc
+        
         # Normalize to NFKC form (compatible equivalence)
         normalized = unicodedata.normalize('NFKC', text)
         
-        # If the text didn't change, just return the document
-        if normalized == text:
-            return doc
-        
         # Since normalization can change the length of the text,
         # we need to rebuild the character map
         result = normalized
-        new_map = {}
         
-        # This is a simplification - full Unicode normalization mapping is complex
-        # For accurate mapping, we would need to track the exact normalization changes
-        if len(normalized) == len(text):
-            # If lengths are the same, mapping is straightforward
+        # Normalizing character by character gives each character's expansion,
+        # unless combining characters compose across character boundaries
+        pieces = [_nfkc_char(char) for char in text]
+        if "".join(pieces) == normalized:
+            lengths = np.fromiter(map(len, pieces), dtype=np.int64, count=len(pieces))
+            new_map = np.repeat(_aligned_map(doc), lengths)
+        elif len(normalized) == len(text):
             new_map = doc.character_map
         else:
             # Otherwise, we need to approximate the mapping
             # This is a simplified approximation that doesn't handle all cases
             ratio = len(doc.original_text) / len(normalized)
-            for i in range(len(normalized)):
-                approx_pos = int(i * ratio)
-                if approx_pos < len(doc.original_text):
-                    new_map[i] = approx_pos
+            new_map = (np.arange(len(normalized)) * ratio).astype(np.int32)
         
         doc.processed_text = result
         doc.character_map = new_map
@@ -255,7 +345,7 @@ class TextPreprocessor:
         try:
             # Only detect if we have enough text
             if len(doc.processed_text) >= 10:
-                lang = detect_language(doc.processed_text[:4000])  # Use first 4000 chars
+                lang = detect_language(doc.processed_text[:_LANG_SAMPLE_CHARS])  # Use first 4000 chars
                 doc.metadata["detected_language"] = lang
         except Exception as e:
             logger.warning(f"Language detection failed: {e}")
@@ -268,7 +358,7 @@ class TextPreprocessor:
         text = doc.processed_text
         
         # Simple paragraph-based segmentation
-        paragraphs = re.split(r'\n\s*\n', text)
+        paragraphs = _PARAGRAPH_BREAK_RE.split(text)
         segments = []
         
         pos = 0
@@ -296,25 +386,12 @@ class TextPreprocessor:
         """Apply OCR-specific text cleanup"""
         text = doc.processed_text
         
-        # Common OCR error patterns and corrections
-        ocr_fixes = [
-            # Format: (pattern, replacement)
-            (r'l\b', '1'),              # Lowercase l at end of word -> 1
-            (r'\b0\b', 'O'),            # Single 0 -> O
-            (r'rn', 'm'),               # 'rn' -> 'm'
-            (r'S\$', '$'),              # S$ -> $
-            (r'，', ','),               # Full-width comma -> regular comma
-        ]
-        
         # Apply fixes and track changes
-        result = text
-        change_count = 0
+        change_count = sum(text.count(char) for char in _OCR_CHAR_FIXES)
+        result = text.translate(_OCR_CHAR_TABLE) if change_count else text
         
-        for pattern, replacement in ocr_fixes:
-            new_text = re.sub(pattern, replacement, result)
-            if new_text != result:
-                change_count += len(re.findall(pattern, result))
-                result = new_text
+        result, count = _OCR_FIX_RE.subn(lambda match: _OCR_REPLACEMENTS[match.group()], result)
+        change_count += count
         
         # If no changes were made, return the original document
         if change_count == 0:
@@ -332,27 +409,15 @@ class TextPreprocessor:
         """Remove common boilerplate text"""
         text = doc.processed_text
         
-        # Common boilerplate patterns to remove
-        boilerplate_patterns = [
-            r'Page \d+ of \d+',
-            r'CONFIDENTIAL',
-            r'©\s*\d{4}.*\bAll rights reserved\b',
-            r'www\.[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}',
-            r'Powered by.*'
-        ]
-        
-        # Apply pattern removal
-        result = text
+        # Blank out every match with spaces so positions are preserved
         removed_count = 0
         
-        for pattern in boilerplate_patterns:
-            matches = list(re.finditer(pattern, result, re.IGNORECASE))
-            removed_count += len(matches)
-            
-            # Remove in reverse order to preserve positions
-            for match in reversed(matches):
-                start, end = match.span()
-                result = result[:start] + ' ' * (end - start) + result[end:]
+        def blank(match):
+            nonlocal removed_count
+            removed_count += 1
+            return ' ' * (match.end() - match.start())
+        
+        result = _BOILERPLATE_RE.sub(blank, text)
         
         # If no changes were made, return the original document
         if removed_count == 0:
@@ -2,23 +2,34 @@ from motor.motor_asyncio import AsyncIOMotorClient
 
 MONGO_DETAILS = "mongodb://localhost:27017"
 client = None
+_db = None
 
 def get_database():
-    return client["test_db"] if client else None
+    return _db
 
 async def connect_to_mongo():
-    global client
+    global client, _db
     try:
-        client = AsyncIOMotorClient(MONGO_DETAILS)
+        client = AsyncIOMotorClient(
+            MONGO_DETAILS,
+            maxPoolSize=50,
+            minPoolSize=5,
+            serverSelectionTimeoutMS=2000,
+            connectTimeoutMS=2000,
+            uuidRepresentation="standard"
+        )
         # Test the connection
         await client.admin.command('ping')
+        _db = client["test_db"]
         print("Connected to MongoDB successfully")
     except Exception as e:
         print(f"Warning: Could not connect to MongoDB: {e}")
         print("API will start but database operations will fail")
         client = None
+        _db = None
 
 async def close_mongo_connection():
-    global client
+    global client, _db
+    _db = None
     if client:
         client.close()
@@ -0,0 +1,12 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from app.utils.serialization import dumps_json
+
+class NumpyJSONResponse(JSONResponse):
+    """JSON response encoded with dumps_json, so numpy values and custom classes
+    in the content serialize without a separate conversion pass"""
+    
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
@@ -1,7 +1,18 @@
+import dataclasses
 import numpy as np
-from typing import Any, Dict, List, Union
+from typing import Any, Callable, Dict, List, Union
 import sys
 import inspect
+import json
+
+from app.services.text_preprocessing import ProcessedDocument, TextSegment
+
+# Try to import optional dependencies
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 def convert_numpy_types(obj: Any) -> Any:
     """
@@ -15,54 +26,234 @@ def convert_numpy_types(obj: Any) -> Any:
     Returns:
         The object with numpy types and custom objects converted to Python native types
     """
-    # Handle ProcessedDocument class
-    if obj.__class__.__name__ == 'ProcessedDocument':
-        return {
-            'original_text': convert_numpy_types(obj.original_text),
-            'processed_text': convert_numpy_types(obj.processed_text),
-            'segments': convert_numpy_types(obj.segments),
-            'metadata': convert_numpy_types(obj.metadata),
-            # Convert the character map (keys are strings in MongoDB)
-            'character_map': {str(k): v for k, v in convert_numpy_types(obj.character_map).items()},
-            '_type': 'ProcessedDocument'  # Add type information for possible reconstitution
-        }
+    # Convert iteratively: every container is created empty, placed in its parent,
+    # and its children are queued as (container, slot, value) frames to fill it
+    root = {}
+    stack = [(root, None, obj)]
+    while stack:
+        parent, slot, value = stack.pop()
+        
+        # Plain Python scalars need no conversion
+        if type(value) in _PASSTHROUGH:
+            parent[slot] = value
+            continue
+        
+        # Exact types dispatch through the converter table; other types are
+        # classified on their first instance and remembered
+        value_type = type(value)
+        converter = _CONVERTERS.get(value_type) or _resolved_converters.get(value_type)
+        if converter is None:
+            converter = _resolve_converter(value)
+        parent[slot] = converter(value, stack)
     
-    # Handle TextSegment class
-    if obj.__class__.__name__ == 'TextSegment':
-        return {
-            'text': obj.text,
-            'start': obj.start,
-            'end': obj.end,
-            'metadata': convert_numpy_types(obj.metadata),
-            '_type': 'TextSegment'  # Add type information
-        }
+    return root[None]
+
+def convert_numpy_types_inplace(obj: Any) -> Any:
+    """
+    Convert numpy data types to Python native types like convert_numpy_types, but
+    update dictionaries and lists in place instead of copying them.
     
-    # Handle dictionaries
-    if isinstance(obj, dict):
-        return {k: convert_numpy_types(v) for k, v in obj.items()}
+    Only use this on objects the caller owns, such as a deep copy or a freshly
+    loaded document: every dict and list reachable from obj may be modified.
     
-    # Handle lists and tuples
-    elif isinstance(obj, (list, tuple)):
-        return [convert_numpy_types(item) for item in obj]
+    Args:
+        obj: The object to convert (can be a dict, list, or individual value)
+        
+    Returns:
+        obj itself if it is a dict or list, otherwise its converted value
+    """
+    root = {}
+    stack = [(root, None, obj)]
+    while stack:
+        parent, slot, value = stack.pop()
+        value_type = type(value)
+        
+        # Dictionaries and lists keep their identity; only values that need
+        # converting are queued and written back into their slots
+        if value_type in _PASSTHROUGH:
+            pass
+        elif isinstance(value, dict):
+            stack.extend((value, k, v) for k, v in value.items() if type(v) not in _PASSTHROUGH)
+        elif isinstance(value, list):
+            stack.extend((value, i, item) for i, item in enumerate(value) if type(item) not in _PASSTHROUGH)
+        else:
+            converter = _CONVERTERS.get(value_type) or _resolved_converters.get(value_type)
+            if converter is None:
+                converter = _resolve_converter(value)
+            value = converter(value, stack)
+        parent[slot] = value
     
+    return root[None]
+
+# Converters return the converted container and queue its children on the stack
+
+def _convert_processed_document(doc: ProcessedDocument, stack: list) -> Dict[str, Any]:
+    converted = dict.fromkeys(('original_text', 'processed_text', 'segments', 'metadata'))
+    # Convert the character map (keys are strings in MongoDB; unmapped positions are left out)
+    converted['character_map'] = _character_map_dict(doc.character_map)
+    converted['_type'] = 'ProcessedDocument'  # Add type information for possible reconstitution
+    stack.extend((converted, key, getattr(doc, key)) for key in
+                 ('original_text', 'processed_text', 'segments', 'metadata'))
+    return converted
+
+def _character_map_dict(character_map: Union[np.ndarray, List[int]]) -> Dict[str, int]:
+    """Mapped positions of a character map, keyed by position as a string"""
+    # Filter in numpy and unbox only the mapped positions, in two bulk tolist calls
+    character_map = np.asarray(character_map)
+    positions = np.flatnonzero(character_map != -1)
+    return dict(zip(map(str, positions.tolist()), character_map[positions].tolist()))
+
+def _convert_text_segment(segment: TextSegment, stack: list) -> Dict[str, Any]:
+    converted = {
+        'text': segment.text,
+        'start': segment.start,
+        'end': segment.end,
+        'metadata': None,
+        '_type': 'TextSegment'  # Add type information
+    }
+    stack.append((converted, 'metadata', segment.metadata))
+    return converted
+
+# Containers are copied whole, so only children that need converting are queued
+
+def _convert_dict(value: dict, stack: list) -> Dict[Any, Any]:
+    converted = dict(value)
+    stack.extend((converted, k, v) for k, v in value.items() if type(v) not in _PASSTHROUGH)
+    return converted
+
+def _convert_sequence(value: Union[list, tuple], stack: list) -> List[Any]:
+    converted = list(value)
+    stack.extend((converted, i, item) for i, item in enumerate(value) if type(item) not in _PASSTHROUGH)
+    return converted
+
+_PASSTHROUGH = frozenset({str, int, float, bool, type(None), bytes})
+
+def _convert_object(value: Any, stack: list) -> Dict[str, Any]:
+    # Convert object to dictionary
+    attributes = vars(value)
+    converted = dict.fromkeys(attributes)
+    converted['_type'] = value.__class__.__name__  # Add type information
+    stack.extend((converted, k, v) for k, v in attributes.items() if k != '_type')
+    return converted
+
+def _dataclass_converter(cls: type) -> Callable[[Any, list], Dict[str, Any]]:
+    """Converter for instances of a dataclass, iterating its declared fields"""
+    names = tuple(f.name for f in dataclasses.fields(cls))
+    attributes = tuple(name for name in names if name != '_type')
+    type_name = cls.__name__
+    
+    def convert(value: Any, stack: list) -> Dict[str, Any]:
+        converted = dict.fromkeys(names)
+        converted['_type'] = type_name  # Add type information
+        stack.extend((converted, name, getattr(value, name)) for name in attributes)
+        return converted
+    
+    return convert
+
+def _resolve_converter(value: Any) -> Callable[[Any, list], Any]:
+    """Classify a type outside the converter table by one of its instances"""
     # Handle numpy scalars (convert to Python native types)
-    elif isinstance(obj, np.number):
-        return obj.item()  # Converts numpy type to equivalent Python type
+    if isinstance(value, np.number):
+        converter = lambda value, stack: value.item()
+    
+    # Handle subclasses of dictionaries, lists and tuples
+    elif isinstance(value, dict):
+        converter = _convert_dict
+    elif isinstance(value, (list, tuple)):
+        converter = _convert_sequence
     
     # Handle numpy arrays
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()  # Convert numpy array to list
+    elif isinstance(value, np.ndarray):
+        converter = lambda value, stack: value.tolist()
     
-    # Handle any other dataclass or object with __dict__ attribute
-    elif hasattr(obj, '__dict__') and not callable(obj):
-        try:
-            # Convert object to dictionary
-            return {
-                **{k: convert_numpy_types(v) for k, v in obj.__dict__.items()},
-                '_type': obj.__class__.__name__  # Add type information
-            }
-        except:
-            pass
+    # Handle dataclasses through their fields, read once per class
+    elif dataclasses.is_dataclass(value) and not isinstance(value, type):
+        converter = _dataclass_converter(type(value))
+    
+    # Handle any other object with __dict__ attribute
+    elif hasattr(value, '__dict__') and not callable(value):
+        converter = _convert_object
+    
+    # Leave unchanged if not a numpy type or custom object
+    else:
+        converter = lambda value, stack: value
+    
+    # Bound the cache in case classes are generated dynamically
+    if len(_resolved_converters) >= _MAX_RESOLVED_CONVERTERS:
+        _resolved_converters.clear()
+    _resolved_converters[type(value)] = converter
+    return converter
+
+_CONVERTERS = {
+    ProcessedDocument: _convert_processed_document,
+    TextSegment: _convert_text_segment,
+    dict: _convert_dict,
+    list: _convert_sequence,
+    tuple: _convert_sequence,
+    np.ndarray: lambda value, stack: value.tolist(),
+}
+
+# Converters for other types, filled in by _resolve_converter
+_MAX_RESOLVED_CONVERTERS = 256
+_resolved_converters: Dict[type, Callable[[Any, list], Any]] = {}
+
+def _serialize_custom(obj: Any) -> Any:
+    """orjson default hook for objects it can't encode natively"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()  # Non-contiguous arrays
+    if isinstance(obj, np.number):
+        return obj.item()
+    # Custom objects become shallow dicts; orjson encodes numpy arrays inside them
+    # directly instead of boxing every element into a Python object
+    if type(obj) is ProcessedDocument:
+        return {
+            'original_text': obj.original_text,
+            'processed_text': obj.processed_text,
+            'segments': obj.segments,
+            'metadata': obj.metadata,
+            'character_map': _character_map_dict(obj.character_map),
+            '_type': 'ProcessedDocument'
+        }
+    if type(obj) is TextSegment:
+        return {
+            'text': obj.text,
+            'start': obj.start,
+            'end': obj.end,
+            'metadata': obj.metadata,
+            '_type': 'TextSegment'
+        }
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {
+            **{f.name: getattr(obj, f.name) for f in dataclasses.fields(obj)},
+            '_type': obj.__class__.__name__
+        }
+    if hasattr(obj, '__dict__') and not callable(obj):
+        return {**vars(obj), '_type': obj.__class__.__name__}
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def dumps_json(obj: Any, indent: bool = False) -> bytes:
+    """
+    Serialize an object to UTF-8 JSON, converting numpy types and custom classes
+    the same way as convert_numpy_types.
+    
+    Args:
+        obj: The object to serialize
+        indent: Whether to indent the output by two spaces
+        
+    Returns:
+        The JSON document as bytes
+    """
+    if not ORJSON_AVAILABLE:
+        return json.dumps(
+            convert_numpy_types(obj),
+            indent=2 if indent else None,
+            separators=None if indent else (",", ":"),
+            ensure_ascii=False
+        ).encode("utf-8")
     
-    # Return unchanged if not a numpy type or custom object
-    return obj
\ No newline at end of file
+    # numpy values and dict keys are encoded in C; dataclasses go through the
+    # default hook so they keep their _type information
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, default=_serialize_custom, option=option)
@@ -1,16 +1,21 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 import uvicorn
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
+
+# Constant responses, encoded once
+_ROOT_RESPONSE = ORJSONResponse({"test": "working"})
+_HEALTH_RESPONSE = ORJSONResponse({"status": "ok"})
 
 @app.get("/")
-def root():
-    return {"test": "working"}
+async def root():
+    return _ROOT_RESPONSE
 
 @app.get("/health")
-def health():
-    return {"status": "ok"}
+async def health():
+    return _HEALTH_RESPONSE
 
 if __name__ == "__main__":
     print("Starting basic test server...")
-    uvicorn.run(app, host="127.0.0.1", port=8002)
\ No newline at end of file
+    uvicorn.run(app, host="127.0.0.1", port=8002, access_log=False)
\ No newline at end of file
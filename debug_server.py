@@ -2,6 +2,7 @@
 Minimal FastAPI server to test basic functionality
 """
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 import logging
 import uvicorn
 
@@ -9,17 +10,21 @@ import uvicorn
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Debug Server")
+app = FastAPI(title="Debug Server", default_response_class=ORJSONResponse)
+
+# Constant responses, encoded once
+_ROOT_RESPONSE = ORJSONResponse({"message": "Debug server is running"})
+_HEALTH_RESPONSE = ORJSONResponse({"status": "healthy"})
 
 @app.get("/")
 async def root():
     logger.info("Root endpoint called")
-    return {"message": "Debug server is running"}
+    return _ROOT_RESPONSE
 
 @app.get("/health")
 async def health():
     logger.info("Health endpoint called")
-    return {"status": "healthy"}
+    return _HEALTH_RESPONSE
 
 @app.on_event("startup")
 async def startup_event():
@@ -31,4 +36,4 @@ async def shutdown_event():
 
 if __name__ == "__main__":
     logger.info("Starting debug server...")
-    uvicorn.run(app, host="127.0.0.1", port=8001, log_level="info")
\ No newline at end of file
+    uvicorn.run(app, host="127.0.0.1", port=8001, log_level="info", access_log=False)
\ No newline at end of file
@@ -1,55 +1,55 @@
 """
 Lightweight FastAPI app that delays ML model loading
 """
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from fastapi import Depends, HTTPException
+import msgspec
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
+import asyncio
 import logging
-from datetime import datetime
+import time
+from app.factory import FRONTEND_ORIGINS, make_app, msgspec_body
 from app.utils.db import connect_to_mongo, close_mongo_connection
 from app.routers import upload_router, example_router
+from app.utils.responses import NumpyJSONResponse
+
+if TYPE_CHECKING:
+    # Imported at call time so startup doesn't load the extraction libraries
+    from app.services.file_service import FileService
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Lightweight PII Detection API", version="1.0.0")
-
-# CORS middleware
-origins = [
-    "http://localhost:3000",
-    "http://localhost:5173",
-    "http://127.0.0.1:5173",
-]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+app = make_app(
+    "Lightweight PII Detection API",
+    cors_origins=FRONTEND_ORIGINS,
+    response_class=NumpyJSONResponse,
+    version="1.0.0"
 )
 
 # Include routers
 app.include_router(upload_router.router)
 app.include_router(example_router.router)
 
-# Pydantic models
-class DetectionRequest(BaseModel):
+# Request bodies, decoded and validated by msgspec
+class DetectionRequest(msgspec.Struct):
     text: str
     file_id: Optional[str] = None
     user_id: Optional[str] = None
-    options: Optional[Dict[str, Any]] = {}
+    options: Dict[str, Any] = msgspec.field(default_factory=dict)
 
-class FileDetectionRequest(BaseModel):
+class FileDetectionRequest(msgspec.Struct):
     file_id: str
     user_id: Optional[str] = None
-    options: Optional[Dict[str, Any]] = {}
+    options: Dict[str, Any] = msgspec.field(default_factory=dict)
 
 # Global variable to track if models are initialized
 _models_loaded = False
 
+# Orchestrator shared by all requests once initialized
+_orchestrator = None
+_orchestrator_lock = asyncio.Lock()
+
 @app.on_event("startup")
 async def startup_db_client():
     await connect_to_mongo()
@@ -60,11 +60,11 @@ async def shutdown_db_client():
     await close_mongo_connection()
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Lightweight PII Detection API ready!", "models_loaded": _models_loaded}
 
 @app.get("/health")
-def health_check():
+async def health_check():
     return {
         "status": "healthy",
         "message": "API is running",
@@ -73,25 +73,32 @@ def health_check():
 
 async def _get_orchestrator():
     """Lazy load the detection orchestrator when first needed"""
-    global _models_loaded
-    try:
-        from app.services.detection_orchestrator import PiiDetectionOrchestrator
-        
-        if not _models_loaded:
+    global _orchestrator, _models_loaded
+    if _orchestrator is not None:
+        return _orchestrator
+    
+    # Concurrent first requests wait for a single initialization
+    async with _orchestrator_lock:
+        if _orchestrator is not None:
+            return _orchestrator
+        try:
+            from app.services.detection_orchestrator import DetectionOrchestrator
+            
             logger.info("Loading ML models on first use...")
-        
-        orchestrator = PiiDetectionOrchestrator()
-        await orchestrator.initialize()
-        _models_loaded = True
-        return orchestrator
-    except Exception as e:
-        logger.error(f"Failed to initialize orchestrator: {e}")
-        raise HTTPException(status_code=500, detail=f"Model initialization failed: {str(e)}")
+            
+            orchestrator = DetectionOrchestrator()
+            await orchestrator.initialize()
+            _orchestrator = orchestrator
+            _models_loaded = True
+            return orchestrator
+        except Exception as e:
+            logger.error(f"Failed to initialize orchestrator: {e}")
+            raise HTTPException(status_code=500, detail=f"Model initialization failed: {str(e)}")
 
 @app.post("/detect/text")
-async def detect_pii_in_text(request: DetectionRequest):
+async def detect_pii_in_text(request: DetectionRequest = Depends(msgspec_body(DetectionRequest))):
     """Detect PII in text with lazy model loading"""
-    start_time = datetime.utcnow()
+    start_time = time.perf_counter()
     
     try:
         if not request.text or not request.text.strip():
@@ -116,7 +123,7 @@ async def detect_pii_in_text(request: DetectionRequest):
             )
         
         # Calculate processing time
-        processing_time = (datetime.utcnow() - start_time).total_seconds()
+        processing_time = time.perf_counter() - start_time
         result["processing_time"] = processing_time
         
         logger.info(f"Text detection completed in {processing_time:.2f}s, found {result.get('summary', {}).get('total_entities', 0)} entities")
@@ -130,9 +137,9 @@ async def detect_pii_in_text(request: DetectionRequest):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.post("/detect/file")
-async def detect_pii_in_file(request: FileDetectionRequest):
+async def detect_pii_in_file(request: FileDetectionRequest = Depends(msgspec_body(FileDetectionRequest))):
     """Detect PII in uploaded file with lazy model loading"""
-    start_time = datetime.utcnow()
+    start_time = time.perf_counter()
     
     try:
         if not request.file_id:
@@ -156,21 +163,27 @@ async def detect_pii_in_file(request: FileDetectionRequest):
         if not text_content or not text_content.strip():
             raise HTTPException(status_code=400, detail="No text content found in file")
         
-        # Update file status
-        await file_service.update_file_status(request.file_id, "processing")
-        
-        # Lazy load orchestrator and run detection
-        orchestrator = await _get_orchestrator()
-        
-        result = await orchestrator.detect_pii(
-            text=text_content,
-            user_id=request.user_id,
-            file_id=request.file_id,
-            file_path=file_data["file_path"],
-            original_filename=file_data["original_filename"],
-            **request.options
+        # Update file status while the models load and detection runs
+        status_update = asyncio.create_task(
+            file_service.update_file_status(request.file_id, "processing")
         )
         
+        try:
+            # Lazy load orchestrator and run detection
+            orchestrator = await _get_orchestrator()
+            
+            result = await orchestrator.detect_pii(
+                text=text_content,
+                user_id=request.user_id,
+                file_id=request.file_id,
+                file_path=file_data["file_path"],
+                original_filename=file_data["original_filename"],
+                **request.options
+            )
+        finally:
+            # The final status written below must not race this update
+            await status_update
+        
         if not result.get("success", False):
             await file_service.update_file_status(request.file_id, "error")
             raise HTTPException(
@@ -182,7 +195,7 @@ async def detect_pii_in_file(request: FileDetectionRequest):
         await file_service.update_file_status(request.file_id, "completed")
         
         # Calculate processing time
-        processing_time = (datetime.utcnow() - start_time).total_seconds()
+        processing_time = time.perf_counter() - start_time
         result["processing_time"] = processing_time
         
         logger.info(f"File detection completed in {processing_time:.2f}s, found {result.get('summary', {}).get('total_entities', 0)} entities")
@@ -195,7 +208,7 @@ async def detect_pii_in_file(request: FileDetectionRequest):
         logger.error(f"Unexpected error in file detection: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-async def _extract_text_from_file(file_data: dict, file_service) -> str:
+async def _extract_text_from_file(file_data: dict, file_service: "FileService") -> str:
     """Extract text content from file based on file type"""
     try:
         file_path = file_data["file_path"]
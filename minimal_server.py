@@ -2,6 +2,7 @@
 Minimal server for debugging shutdown issue
 """
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 import uvicorn
 import logging
 import signal
@@ -10,7 +11,7 @@ import sys
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 def signal_handler(sig, frame):
     logger.info(f"Received signal {sig}")
@@ -19,14 +20,18 @@ def signal_handler(sig, frame):
 signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
 
+# Constant responses, encoded once
+_ROOT_RESPONSE = ORJSONResponse({"message": "Minimal server running"})
+_HEALTH_RESPONSE = ORJSONResponse({"status": "ok"})
+
 @app.get("/")
-def root():
-    return {"message": "Minimal server running"}
+async def root():
+    return _ROOT_RESPONSE
 
 @app.get("/health")  
-def health():
-    return {"status": "ok"}
+async def health():
+    return _HEALTH_RESPONSE
 
 if __name__ == "__main__":
     logger.info("Starting minimal server...")
-    uvicorn.run(app, host="127.0.0.1", port=8003, log_level="info")
\ No newline at end of file
+    uvicorn.run(app, host="127.0.0.1", port=8003, log_level="info", access_log=False)
\ No newline at end of file
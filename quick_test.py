@@ -6,6 +6,9 @@ Usage: python quick_test.py
 import requests
 import json
 
+# One session keeps the connection to the server alive between requests
+_SESSION = requests.Session()
+
 def quick_test():
     """Quick test of the PII detection API"""
     
@@ -20,7 +23,7 @@ def quick_test():
     
     try:
         # Test the detection endpoint
-        response = requests.post(
+        response = _SESSION.post(
             "http://127.0.0.1:8000/detect/text",
             json={
                 "text": test_text,
@@ -2,28 +2,27 @@
 Simple FastAPI server with rule-based PII detection only
 This avoids heavy ML model downloads for quick testing
 """
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import Depends, HTTPException
+import msgspec
 from pydantic import BaseModel
 from typing import List, Dict, Any
+from app.factory import make_app, msgspec_body
 from app.services.rule_based_detector import RuleBasedDetector
+from app.utils.responses import NumpyJSONResponse
 import asyncio
 
-app = FastAPI(title="Simple PII Detection API", version="1.0.0")
-
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+app = make_app("Simple PII Detection API", response_class=NumpyJSONResponse, version="1.0.0")
 
 # Global detector instance
 detector = RuleBasedDetector()
 
-class DetectionRequest(BaseModel):
+@app.on_event("startup")
+async def warm_up_detector():
+    # Patterns compile in the constructor; one detection also sets up the
+    # per-thread scan state and subset caches before the first request
+    await detector.detect("john@doe.com 555-123-4567 123-45-6789")
+
+class DetectionRequest(msgspec.Struct):
     text: str
     user_id: str = "anonymous"
 
@@ -33,16 +32,20 @@ class DetectionResponse(BaseModel):
     candidates: List[Dict[str, Any]]
     processing_time: float
 
+# Constant responses, encoded once
+_ROOT_RESPONSE = NumpyJSONResponse({"message": "Simple PII Detection API", "status": "running"})
+_HEALTH_RESPONSE = NumpyJSONResponse({"status": "healthy", "detector": "rule-based"})
+
 @app.get("/")
-def root():
-    return {"message": "Simple PII Detection API", "status": "running"}
+async def root():
+    return _ROOT_RESPONSE
 
 @app.get("/health")
-def health():
-    return {"status": "healthy", "detector": "rule-based"}
+async def health():
+    return _HEALTH_RESPONSE
 
 @app.post("/detect/text", response_model=DetectionResponse)
-async def detect_pii_text(request: DetectionRequest):
+async def detect_pii_text(request: DetectionRequest = Depends(msgspec_body(DetectionRequest))):
     """Detect PII in text using rule-based patterns only"""
     try:
         import time
@@ -53,17 +56,18 @@ async def detect_pii_text(request: DetectionRequest):
         processing_time = time.time() - start_time
         
         # Convert candidates to dict format
-        candidates_dict = []
-        for candidate in candidates:
-            candidates_dict.append({
-                "id": f"candidate_{len(candidates_dict)}",
+        candidates_dict = [
+            {
+                "id": f"candidate_{i}",
                 "type": str(candidate.type),
                 "text": candidate.text,
                 "start": candidate.start,
                 "end": candidate.end,
                 "confidence": candidate.confidence,
                 "metadata": candidate.metadata or {}
-            })
+            }
+            for i, candidate in enumerate(candidates)
+        ]
         
         return DetectionResponse(
             success=True,
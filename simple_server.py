@@ -1,22 +1,21 @@
 #!/usr/bin/env python3
 
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import Depends
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
+import msgspec
+import re
 
-# Simple FastAPI app for testing
-app = FastAPI(title="Simple PII Detection API")
+from app.factory import make_app, msgspec_body
+
+# Substrings the mock detections key on
+_PII_HINTS = re.compile(r'[@.+]|555|123')
+_PHONE_HINTS = frozenset({"555", "123", "+"})
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Simple FastAPI app for testing
+app = make_app("Simple PII Detection API", response_class=ORJSONResponse)
 
-class DetectionRequest(BaseModel):
+class DetectionRequest(msgspec.Struct):
     text: str
 
 class DetectionResponse(BaseModel):
@@ -24,27 +23,31 @@ class DetectionResponse(BaseModel):
     detections: list
     message: str
 
+# Constant responses, encoded once
+_ROOT_RESPONSE = ORJSONResponse({"message": "Simple PII Detection API", "status": "running"})
+_HEALTH_RESPONSE = ORJSONResponse({"status": "healthy", "message": "API is running"})
+
 @app.get("/")
-def read_root():
-    return {"message": "Simple PII Detection API", "status": "running"}
+async def read_root():
+    return _ROOT_RESPONSE
 
 @app.get("/health")
-def health_check():
-    return {
-        "status": "healthy",
-        "message": "API is running"
-    }
+async def health_check():
+    return _HEALTH_RESPONSE
 
 @app.post("/detect/text")
-def detect_pii_simple(request: DetectionRequest):
+async def detect_pii_simple(request: DetectionRequest = Depends(msgspec_body(DetectionRequest))):
     """Simple PII detection (mock for testing)"""
     text = request.text
     
     # Simple mock detections for testing
     detections = []
     
+    # One scan collects every hint the checks below look for
+    hints = set(_PII_HINTS.findall(text))
+    
     # Basic email detection
-    if "@" in text and "." in text:
+    if "@" in hints and "." in hints:
         detections.append({
             "type": "EMAIL",
             "text": "email@example.com",
@@ -53,7 +56,7 @@ def detect_pii_simple(request: DetectionRequest):
         })
     
     # Basic phone detection
-    if any(char in text for char in ["555", "123", "+"]):
+    if not _PHONE_HINTS.isdisjoint(hints):
         detections.append({
             "type": "PHONE",
             "text": "phone_number",
@@ -6,10 +6,13 @@ import json
 from pathlib import Path
 import time
 
+# One session keeps the connection to the server alive between requests
+_SESSION = requests.Session()
+
 def test_server_health():
     """Test if the server is running"""
     try:
-        response = requests.get("http://localhost:8000/", timeout=5)
+        response = _SESSION.get("http://localhost:8000/", timeout=5)
         print(f"✅ Server is running! Status: {response.status_code}")
         return True
     except requests.exceptions.ConnectionError:
@@ -33,7 +36,7 @@ def test_upload_endpoint():
             files = {'file': ('test.txt', f, 'text/plain')}
             data = {'user_id': 'test_user_123'}
             
-            response = requests.post(url, files=files, data=data, timeout=10)
+            response = _SESSION.post(url, files=files, data=data, timeout=10)
         
         print(f"Upload Status Code: {response.status_code}")
         
@@ -59,7 +62,7 @@ def test_get_metadata(file_id):
     """Test getting file metadata"""
     try:
         url = f"http://localhost:8000/upload/file/{file_id}"
-        response = requests.get(url, timeout=5)
+        response = _SESSION.get(url, timeout=5)
         
         print(f"Metadata Status Code: {response.status_code}")
         
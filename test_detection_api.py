@@ -3,6 +3,9 @@
 import requests
 import json
 
+# One session keeps the connection to the server alive between requests
+_SESSION = requests.Session()
+
 def test_detection_endpoint():
     """Test the /detect/text endpoint"""
     url = "http://localhost:8000/detect/text"
@@ -13,7 +16,7 @@ def test_detection_endpoint():
     
     try:
         print("Testing /detect/text endpoint...")
-        response = requests.post(url, json=payload, timeout=30)
+        response = _SESSION.post(url, json=payload, timeout=30)
         
         print(f"Status Code: {response.status_code}")
         
@@ -41,7 +44,7 @@ def test_health_endpoint():
     """Test the health endpoint"""
     try:
         print("Testing health endpoint...")
-        response = requests.get("http://localhost:8000/health", timeout=5)
+        response = _SESSION.get("http://localhost:8000/health", timeout=5)
         
         if response.status_code == 200:
             print(f"✅ Health check passed: {response.json()}")
@@ -3,9 +3,40 @@ Test script for document text extraction with OCR and MRZ detection
 """
 import asyncio
 import os
-import json
+import aiofiles
+import numpy as np
+import orjson
 from app.services.extractor import DocumentExtractor
 
+async def _write_pages(path, pages):
+    """Write extraction results as a JSON array, encoding one page at a time"""
+    async with aiofiles.open(path, 'wb') as f:
+        await f.write(b'[')
+        for i, page in enumerate(pages):
+            if i:
+                await f.write(b',')
+            await f.write(orjson.dumps(page, default=str, option=orjson.OPT_NON_STR_KEYS))
+        await f.write(b']')
+
+def _block_counts(pages):
+    """Number of text blocks on each page"""
+    return np.fromiter((len(page['text_blocks']) for page in pages), dtype=np.int32, count=len(pages))
+
+async def _extract_pdf(extractor, pdf_path):
+    """Extract a PDF and save the results for inspection"""
+    print(f"Testing PDF extraction with {os.path.basename(pdf_path)}")
+    results = await extractor.extract_text(pdf_path, "pdf")
+    counts = _block_counts(results)
+    print(f"PDF extraction completed. Found {int(counts.sum())} text blocks across {counts.size} pages")
+    await _write_pages('pdf_extraction_results.json', results)
+
+async def _extract_image(extractor, image_path):
+    """Extract an image and save the results for inspection"""
+    print(f"Testing image extraction with {os.path.basename(image_path)}")
+    results = await extractor.extract_text(image_path)
+    print(f"Image extraction completed. Found {int(_block_counts(results).sum())} text blocks")
+    await _write_pages('image_extraction_results.json', results)
+
 async def test_extraction():
     """
     Test document extraction for different file types
@@ -15,29 +46,26 @@ async def test_extraction():
     # Test directory with sample files
     test_dir = "temp_uploads"
     
-    # Test PDF extraction
-    pdf_files = [f for f in os.listdir(test_dir) if f.endswith('.pdf')]
-    if pdf_files:
-        print(f"Testing PDF extraction with {pdf_files[0]}")
-        pdf_path = os.path.join(test_dir, pdf_files[0])
-        results = await extractor.extract_text(pdf_path, "pdf")
-        print(f"PDF extraction completed. Found {sum(len(page['text_blocks']) for page in results)} text blocks across {len(results)} pages")
-        # Save the results to a JSON file for inspection
-        with open('pdf_extraction_results.json', 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, default=str)
+    # Classify the sample files in a single directory pass
+    pdf_files, image_files = [], []
+    with os.scandir(test_dir) as entries:
+        for entry in entries:
+            name = entry.name.lower()
+            if name.endswith('.pdf'):
+                pdf_files.append(entry.path)
+            elif name.endswith(('.png', '.jpg', '.jpeg')):
+                image_files.append(entry.path)
     
-    # Test image extraction
-    image_files = [f for f in os.listdir(test_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+    # PDF parsing and image OCR are independent, so they run together
+    tasks = []
+    if pdf_files:
+        tasks.append(_extract_pdf(extractor, pdf_files[0]))
     if image_files:
-        print(f"Testing image extraction with {image_files[0]}")
-        image_path = os.path.join(test_dir, image_files[0])
-        results = await extractor.extract_text(image_path)
-        print(f"Image extraction completed. Found {sum(len(page['text_blocks']) for page in results)} text blocks")
-        # Save the results to a JSON file for inspection
-        with open('image_extraction_results.json', 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, default=str)
+        tasks.append(_extract_image(extractor, image_files[0]))
+    
+    await asyncio.gather(*tasks)
     
     print("Extraction tests completed")
 
 if __name__ == "__main__":
-    asyncio.run(test_extraction())
\ No newline at end of file
+    asyncio.run(test_extraction())
@@ -2,9 +2,12 @@
 Updated test script for the working PII detection API
 """
 import requests
-import json
+import orjson
 import time
 
+# One session keeps the connection to the server alive between requests
+_SESSION = requests.Session()
+
 def test_detection_api():
     """Test the detection API with proper error handling"""
     
@@ -25,10 +28,10 @@ def test_detection_api():
         
         # Test health endpoint first
         print("1️⃣ Testing health endpoint...")
-        health_response = requests.get('http://127.0.0.1:8000/health', timeout=5)
+        health_response = _SESSION.get('http://127.0.0.1:8000/health', timeout=5)
         if health_response.status_code == 200:
             print("✅ Health check passed!")
-            print(f"   Response: {health_response.json()}")
+            print(f"   Response: {orjson.loads(health_response.content)}")
         else:
             print(f"❌ Health check failed: {health_response.status_code}")
             return False
@@ -37,14 +40,15 @@ def test_detection_api():
         
         # Test detection endpoint
         print("2️⃣ Testing detection endpoint...")
-        detection_response = requests.post(
+        detection_response = _SESSION.post(
             'http://127.0.0.1:8000/detect/text', 
-            json=test_data,
+            data=orjson.dumps(test_data),
+            headers={"Content-Type": "application/json"},
             timeout=30
         )
         
         if detection_response.status_code == 200:
-            result = detection_response.json()
+            result = orjson.loads(detection_response.content)
             print("✅ Detection successful!")
             print(f"   Processing time: {result.get('processing_time', 'N/A')} seconds")
             print(f"   Total entities found: {result.get('summary', {}).get('total_entities', 0)}")
@@ -86,19 +90,27 @@ def wait_for_server(max_wait_time=60):
     """Wait for the server to become available"""
     print(f"⏳ Waiting for server to become available (max {max_wait_time}s)...")
     
-    for attempt in range(max_wait_time):
+    # Poll quickly at first, backing off while the server loads its models
+    start = time.monotonic()
+    deadline = start + max_wait_time
+    delay = 0.1
+    next_progress = 10
+    while time.monotonic() < deadline:
         try:
-            response = requests.get('http://127.0.0.1:8000/health', timeout=2)
+            response = _SESSION.get('http://127.0.0.1:8000/health', timeout=1)
             if response.status_code == 200:
-                print(f"✅ Server is ready after {attempt + 1} seconds!")
+                print(f"✅ Server is ready after {time.monotonic() - start:.1f} seconds!")
                 return True
         except:
             pass
         
-        if attempt % 10 == 9:  # Print progress every 10 seconds
-            print(f"   Still waiting... ({attempt + 1}s elapsed)")
+        elapsed = time.monotonic() - start
+        if elapsed >= next_progress:  # Print progress every 10 seconds
+            print(f"   Still waiting... ({int(elapsed)}s elapsed)")
+            next_progress += 10
         
-        time.sleep(1)
+        time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+        delay = min(delay * 1.5, 2.0)
     
     print(f"❌ Server did not become available within {max_wait_time} seconds")
     return False
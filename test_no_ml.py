@@ -8,6 +8,7 @@ from typing import Optional, Dict, Any
 from app.utils.db import connect_to_mongo, close_mongo_connection
 from app.routers import upload_router, example_router
 import logging
+import re
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +16,15 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Test PII Detection API", version="1.0.0")
 
+# Rule-based patterns used in place of the ML detectors, combined so the
+# text is scanned once; the group name is the entity type
+PII_RE = re.compile(
+    r"(?P<email>[^\s@]+@[^\s@]+\.[^\s@]+)"
+    r"|(?P<ssn>\b\d{3}-\d{2}-\d{4}\b)"
+    r"|(?P<phone>\(?\d{3}\)?[\s\-]\d{3}[\s\-]\d{4})"
+)
+_CONFIDENCE = {"email": 0.8, "ssn": 0.9, "phone": 0.7}
+
 # CORS
 origins = [
     "http://localhost:3000",
@@ -66,29 +76,20 @@ async def detect_pii_simple(request: DetectionRequest):
     logger.info(f"Detection request from user: {request.user_id}")
     
     # Simple rule-based detection for testing
-    text = request.text.lower()
+    # All patterns match case-invariant characters, so the text is scanned as-is
     candidates = []
+    append = candidates.append
     
-    # Simple email detection
-    if "@" in text and "." in text:
-        candidates.append({
-            "id": "test_1",
-            "type": "email", 
-            "text": "detected email pattern",
-            "confidence": 0.8,
-            "start": 0,
-            "end": len(request.text)
-        })
-    
-    # Simple phone detection  
-    if any(char.isdigit() for char in text) and ("(" in text or "-" in text):
-        candidates.append({
-            "id": "test_2",
-            "type": "phone",
-            "text": "detected phone pattern", 
-            "confidence": 0.7,
-            "start": 0,
-            "end": len(request.text)
+    for i, match in enumerate(PII_RE.finditer(request.text), 1):
+        entity_type = match.lastgroup
+        start, end = match.span()
+        append({
+            "id": f"test_{i}",
+            "type": entity_type,
+            "text": match.group(),
+            "confidence": _CONFIDENCE[entity_type],
+            "start": start,
+            "end": end
         })
     
     return {
@@ -0,0 +1,40 @@
+"""
+Regression test for backtracking in the default RAG entity definition patterns
+"""
+import time
+from app.services.rag_detector import KnowledgeBase
+
+def test_rag_patterns():
+    """Default patterns must stay fast on inputs that never complete a match"""
+    definitions = {d.entity_type: d for d in KnowledgeBase()._get_default_definitions()}
+    
+    pathological = {
+        "organization": "Ab " * 3000,
+        "address": "1 ab " * 1500,
+        "url": "http://" + "a" * 5000,
+        "email": "a" * 2000 + "@" + "b." * 1500,
+    }
+    expected = {
+        "organization": "Works at Acme Corp",
+        "address": "lives at 123 Main Street",
+        "url": "see https://example.com:8080/a/b_c.html",
+        "email": "mail john@example.com",
+    }
+    
+    success = True
+    for entity_type, text in pathological.items():
+        definition = definitions[entity_type]
+        start = time.perf_counter()
+        list(definition._union_re.finditer(text))
+        elapsed = time.perf_counter() - start
+        
+        found = [m.group() for m in definition._union_re.finditer(expected[entity_type])]
+        ok = elapsed < 0.5 and bool(found)
+        success = success and ok
+        print(f"{'✅' if ok else '❌'} {entity_type}: {elapsed * 1000:.1f} ms on {len(text)} chars, matched {found}")
+    
+    return success
+
+if __name__ == "__main__":
+    success = test_rag_patterns()
+    print(f"\n{'🎉 Success!' if success else '💥 Failed'}")
@@ -0,0 +1,61 @@
+"""
+Redaction test for overlapping detections
+Two detectors can report spans that overlap; none of the covered text may survive
+"""
+from app.schemas.pii_schemas import (
+    DetectedPII, PIIType, RiskLevel, RedactionStrategy, RedactionOptions
+)
+from app.services.redaction_service import RedactionService
+import asyncio
+
+def _entity(entity_id, pii_type, text, start, end):
+    """Detected entity at text[start:end]"""
+    return DetectedPII(
+        id=entity_id,
+        pii_type=pii_type,
+        text=text[start:end],
+        start_position=start,
+        end_position=end,
+        confidence=0.9,
+        source_detector="test",
+        risk_level=RiskLevel.MEDIUM,
+        redaction_strategy=RedactionStrategy.FULL_MASK
+    )
+
+async def test_overlapping_redaction():
+    """Redact two overlapping entities and check the text they cover is fully masked"""
+    print("Testing redaction of overlapping entities...")
+
+    service = RedactionService()
+    options = RedactionOptions(default_strategy=RedactionStrategy.FULL_MASK)
+
+    text = "see https://example.com/u/john@x.com today"
+    cases = [
+        # The URL stops inside the email, whose mask covers only the rest of it
+        ([(PIIType.URL, 4, 30), (PIIType.EMAIL, 26, 36)], "see " + "X" * 32 + " today"),
+        # Both start at the same place and the longer one must win
+        ([(PIIType.URL, 4, 20), (PIIType.URL, 4, 36)], "see " + "X" * 32 + " today"),
+        # The email lies inside the URL
+        ([(PIIType.URL, 4, 36), (PIIType.EMAIL, 26, 36)], "see " + "X" * 32 + " today"),
+    ]
+
+    try:
+        for spans, expected in cases:
+            entities = [
+                _entity(f"e{i}", pii_type, text, start, end)
+                for i, (pii_type, start, end) in enumerate(spans)
+            ]
+            result = await service.redact_text(text, entities, options)
+            print(f"  - {spans}: '{result.redacted_text}'")
+            assert result.redacted_text == expected, f"expected '{expected}'"
+            assert "john" not in result.redacted_text
+
+        print("\n✅ Overlapping entities were fully redacted")
+        return True
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = asyncio.run(test_overlapping_redaction())
+    print(f"\n{'🎉 Success!' if success else '💥 Failed'}")
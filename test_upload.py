@@ -7,17 +7,25 @@ import requests
 import json
 from pathlib import Path
 
+# Contents of the uploaded test file, sent from memory instead of a file handle
+_TEST_DOCUMENT = b"This is a test document for upload."
+
+def _write_test_document(path: Path) -> bytes:
+    """Create the test file on disk and return the bytes to upload"""
+    path.write_bytes(_TEST_DOCUMENT)
+    return _TEST_DOCUMENT
+
 # Test file upload
 def test_upload():
     url = "http://localhost:8000/upload/"
     
     # Create a simple test file
     test_file_path = Path("test_document.txt")
-    test_file_path.write_text("This is a test document for upload.")
+    payload = _write_test_document(test_file_path)
     
     try:
         # Prepare the request
-        files = {"file": ("test_document.txt", open(test_file_path, "rb"), "text/plain")}
+        files = {"file": ("test_document.txt", payload, "text/plain")}
         data = {"user_id": "user123"}
         
         # Make the request
@@ -1,47 +1,292 @@
 """
 Working FastAPI application with minimal detection capabilities for testing
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response
 from contextlib import asynccontextmanager
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+import msgspec
+import orjson
+from app.factory import msgspec_body
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Pattern
+import asyncio
+import hashlib
+import itertools
 import logging
+import os
 import re
+import threading
+
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Texts at least this long are scanned in a worker thread so the event loop stays free
+_THREAD_SCAN_MIN_CHARS = 32768
+
+# Texts up to this length have their matches cached by SimpleDetector.detect,
+# which keeps the matches of at most _CACHE_SIZE recent texts
+_CACHE_MAX_CHARS = 65536
+_CACHE_SIZE = 1024
+
+# ASCII control characters that \s matches in str patterns but not in bytes patterns
+_STR_ONLY_SPACE_RE = re.compile(r'[\x1c-\x1f]')
+
+# Every pattern but email needs a digit; bytes are searched one digit at a time,
+# which is much faster than a \d regex over text that has none
+_ASCII_DIGITS = tuple(bytes([digit]) for digit in b"0123456789")
+_DIGIT_RE = re.compile(r'\d')
+
+# Separators allowed between card digit groups, and the digit sum of 2*d for
+# each digit d, used for every second digit in the Luhn check
+_CARD_SEPARATOR_RE = re.compile(r'[-\s]')
+_LUHN_DOUBLED = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+
+def _valid_card(value: str) -> bool:
+    """Luhn checksum over a card number, ignoring its separators"""
+    digits = _CARD_SEPARATOR_RE.sub("", value)
+    checksum = sum(map(int, digits[-1::-2]))
+    checksum += sum(_LUHN_DOUBLED[d] for d in map(int, digits[-2::-2]))
+    return checksum % 10 == 0
+
+def _to_candidates(matches: tuple) -> List[Dict[str, Any]]:
+    """Candidate dicts for the (entity_type, text, start, end) matches"""
+    # The match count is known, so the list is sized once up front
+    candidates = [None] * len(matches)
+    for i, (entity_type, value, start, end) in enumerate(matches):
+        candidates[i] = {
+            "id": f"{entity_type}_{i}",
+            "type": entity_type,
+            "text": value,
+            "start": start,
+            "end": end,
+            "confidence": 0.9,
+            "metadata": {}
+        }
+    return candidates
+
 # Simple detection logic without heavy ML models
 class SimpleDetector:
     def __init__(self):
         self.patterns = {
             "email": r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-            "phone": r'\b\(?(\d{3})\)?[-.\s]?(\d{3})[-.\s]?(\d{4})\b',
-            "ssn": r'\b\d{3}-?\d{2}-?\d{4}\b',
-            "credit_card": r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b'
+            "phone": r'\b\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b',
+            # The digit-group patterns spell out ASCII digits and whitespace, which
+            # re tests with a table lookup instead of Unicode categories; digits and
+            # spaces from other scripts are not matched, while \b stays Unicode
+            "ssn": r'\b[0-9]{3}-?[0-9]{2}-?[0-9]{4}\b',
+            "credit_card": r'\b[0-9]{4}[- \t\n\r\f\v]?[0-9]{4}[- \t\n\r\f\v]?[0-9]{4}[- \t\n\r\f\v]?[0-9]{4}\b'
         }
+        # Each pattern is compiled once and run on its own, so matches of
+        # different types that overlap (a phone number inside an email) are
+        # all reported. No pattern needs case folding: the email classes list
+        # both cases and the rest are digits and punctuation
+        self.compiled = {entity_type: self._compile(entity_type) for entity_type in self.patterns}
+        self._hs_db = self._build_hyperscan(list(self.patterns.values()))
+        # Batches are scanned as one buffer, so their database reports every
+        # match instead of the first one per pattern
+        self._hs_batch_db = self._build_hyperscan(list(self.patterns.values()), single_match=False)
+        self._hs_local = threading.local()
+        # The patterns are ASCII, so pure-ASCII text can be scanned as bytes,
+        # which re does faster
+        self._compiled_bytes = {
+            entity_type: self._compile_bytes(entity_type) for entity_type in self.patterns
+        }
+        # Recent texts' matches keyed by length and digest, most recent last; the
+        # worker threads share it, so it is only touched under the lock
+        self._match_cache = OrderedDict()
+        self._match_cache_lock = threading.Lock()
+    
+    def _compile(self, entity_type: str) -> Pattern:
+        """Compiled pattern for the entity type"""
+        return re.compile(self.patterns[entity_type])
+    
+    def _compile_bytes(self, entity_type: str) -> Pattern:
+        """Bytes version of the entity type's re pattern, for ASCII text"""
+        return re.compile(self.patterns[entity_type].encode("ascii"))
+    
+    @staticmethod
+    def _build_hyperscan(patterns: List[str], single_match: bool = True):
+        """Compile the patterns into one Hyperscan database used to prefilter the text"""
+        if not HYPERSCAN_AVAILABLE:
+            return None
+        
+        flags = hyperscan.HS_FLAG_PREFILTER | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+        if single_match:
+            flags |= hyperscan.HS_FLAG_SINGLEMATCH
+        try:
+            db = hyperscan.Database()
+            db.compile(
+                expressions=[p.encode("utf-8") for p in patterns],
+                ids=list(range(len(patterns))),
+                elements=len(patterns),
+                flags=[flags] * len(patterns)
+            )
+        except Exception as e:
+            logger.warning(f"Hyperscan prefilter disabled: {e}")
+            return None
+        return db
+    
+    def _scratch(self, name: str, db):
+        """This thread's Hyperscan scratch space for db"""
+        scratch = getattr(self._hs_local, name, None)
+        if scratch is None:
+            # Scratch space is not thread-safe, so each thread gets its own
+            scratch = hyperscan.Scratch(db)
+            setattr(self._hs_local, name, scratch)
+        return scratch
+    
+    def _possible_types(self, data: bytes) -> tuple:
+        """Entity types whose patterns may match the UTF-8 encoded text, found in one Hyperscan pass"""
+        scratch = self._scratch("scratch", self._hs_db)
+        found = set()
+        
+        def on_match(pattern_id, start, end, flags, context):
+            found.add(pattern_id)
+        
+        self._hs_db.scan(data, match_event_handler=on_match, scratch=scratch)
+        entity_types = list(self.patterns)
+        return tuple(entity_types[i] for i in sorted(found))
+    
+    def _possible_types_batch(self, texts: List[str]) -> List[set]:
+        """Entity types that may match each text, from a single Hyperscan scan of them all"""
+        # NUL can't occur inside any match, so it keeps matches from spanning texts
+        encoded = [text.encode("utf-8") for text in texts]
+        starts = []
+        offset = 0
+        for data in encoded:
+            starts.append(offset)
+            offset += len(data) + 1
+        
+        entity_types = list(self.patterns)
+        found = [set() for _ in texts]
+        
+        def on_match(pattern_id, start, end, flags, context):
+            found[bisect_right(starts, end - 1) - 1].add(entity_types[pattern_id])
+        
+        self._hs_batch_db.scan(
+            b"\x00".join(encoded),
+            match_event_handler=on_match,
+            scratch=self._scratch("batch_scratch", self._hs_batch_db)
+        )
+        return found
+    
+    def _triggered_types(self, haystack, as_bytes: bool) -> tuple:
+        """Entity types whose required character occurs in the text: '@' for email, a digit for the rest"""
+        if as_bytes:
+            has_at = b"@" in haystack
+            has_digit = any(digit in haystack for digit in _ASCII_DIGITS)
+        else:
+            has_at = "@" in haystack
+            has_digit = _DIGIT_RE.search(haystack) is not None
+        return tuple(
+            entity_type for entity_type in self.patterns
+            if (has_at if entity_type == "email" else has_digit)
+        )
+    
+    def _matches(self, text: str, possible: Optional[set] = None) -> tuple:
+        """
+        (entity_type, text, start, end) for every match, pattern by pattern in text order.
+        
+        possible, when given, is the set of entity types a batch prefilter found
+        may match, used instead of scanning this text with Hyperscan.
+        """
+        # Byte offsets equal character offsets for ASCII text, so spans map back
+        # directly and the match text is sliced from the original str
+        as_bytes = text.isascii() and _STR_ONLY_SPACE_RE.search(text) is None
+        haystack = text.encode("ascii") if as_bytes else text
+        compiled = self._compiled_bytes if as_bytes else self.compiled
+        
+        # Most text holds no PII; a memchr-speed search for the characters
+        # every match needs rules out whole patterns before any regex runs
+        entity_types = self._triggered_types(haystack, as_bytes)
+        if not entity_types:
+            return ()
+        if possible is None and self._hs_db is not None:
+            possible = self._possible_types(haystack if as_bytes else text.encode("utf-8"))
+        if possible is not None:
+            # Hyperscan reports every pattern that could match, so only
+            # the ones it didn't rule out need to run
+            entity_types = tuple(t for t in entity_types if t in possible)
+        
+        matches = []
+        for entity_type in entity_types:
+            for match in compiled[entity_type].finditer(haystack):
+                start, end = match.span()
+                value = text[start:end]
+                # Card-shaped digit runs that fail the Luhn check are dropped here, so
+                # they are never built into candidates or serialized
+                if entity_type == "credit_card" and not _valid_card(value):
+                    continue
+                matches.append((entity_type, value, start, end))
+        return tuple(matches)
     
     def detect(self, text: str) -> List[Dict[str, Any]]:
-        candidates = []
-        for entity_type, pattern in self.patterns.items():
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                candidates.append({
-                    "id": f"{entity_type}_{len(candidates)}",
-                    "type": entity_type,
-                    "text": match.group(),
-                    "start": match.start(),
-                    "end": match.end(),
-                    "confidence": 0.9,
-                    "metadata": {}
-                })
-        return candidates
+        # Retries and previews resend the same text, so recent short texts
+        # are answered from the cache; it holds immutable tuples and every
+        # call still gets fresh candidate dicts
+        if len(text) > _CACHE_MAX_CHARS:
+            return _to_candidates(self._matches(text))
+        
+        # Keyed on a 128-bit digest so the cache never holds the request text itself
+        key = (len(text), hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest())
+        with self._match_cache_lock:
+            matches = self._match_cache.get(key)
+            if matches is not None:
+                self._match_cache.move_to_end(key)
+        if matches is None:
+            matches = self._matches(text)
+            with self._match_cache_lock:
+                self._match_cache[key] = matches
+                if len(self._match_cache) > _CACHE_SIZE:
+                    self._match_cache.popitem(last=False)
+        return _to_candidates(matches)
+    
+    def detect_batch(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        """Detect PII in each of several texts, prefiltering them all in one Hyperscan scan"""
+        if self._hs_batch_db is None:
+            return [self.detect(text) for text in texts]
+        possible = self._possible_types_batch(texts)
+        return [
+            _to_candidates(self._matches(text, types))
+            for text, types in zip(texts, possible)
+        ]
 
 # Global detector instance
 detector = SimpleDetector()
 
+# Worker threads that scan long texts, each pinned to its own core where the
+# platform allows it so the pattern database stays warm in that core's cache
+_worker_ids = itertools.count()
+
+def _init_scan_worker():
+    """Pin the new worker thread to a core and allocate its Hyperscan scratch"""
+    if hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        try:
+            os.sched_setaffinity(0, {cores[next(_worker_ids) % len(cores)]})
+        except OSError as e:
+            logger.warning(f"Could not pin scan worker: {e}")
+    if detector._hs_db is not None:
+        detector._scratch("scratch", detector._hs_db)
+    if detector._hs_batch_db is not None:
+        detector._scratch("batch_scratch", detector._hs_batch_db)
+
+_scan_executor = ThreadPoolExecutor(
+    max_workers=len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count(),
+    thread_name_prefix="pii-scan",
+    initializer=_init_scan_worker
+)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
@@ -49,12 +294,14 @@ async def lifespan(app: FastAPI):
     yield
     # Shutdown
     logger.info("Shutting down application...")
+    _scan_executor.shutdown(wait=False)
 
 app = FastAPI(
     title="Working PII Detection API",
     description="Simplified PII detection for testing",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -72,16 +319,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Pydantic models
-class DetectionRequest(BaseModel):
+# Request bodies, decoded and validated by msgspec
+class DetectionRequest(msgspec.Struct):
     text: str
     user_id: Optional[str] = "anonymous"
-    options: Optional[Dict[str, Any]] = {}
+    options: Optional[Dict[str, Any]] = msgspec.field(default_factory=dict)
+
+class BatchDetectionRequest(msgspec.Struct):
+    texts: List[str]
+    user_id: Optional[str] = "anonymous"
+    options: Optional[Dict[str, Any]] = msgspec.field(default_factory=dict)
 
-class FileDetectionRequest(BaseModel):
+class FileDetectionRequest(msgspec.Struct):
     file_id: str
     user_id: Optional[str] = "anonymous"
-    options: Optional[Dict[str, Any]] = {}
+    options: Optional[Dict[str, Any]] = msgspec.field(default_factory=dict)
+
+def _detection_result(text: str, candidates: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Response body for the candidates found in one text"""
+    # Summary counts gathered in one pass over the candidates
+    entity_types = set()
+    high_confidence = 0
+    for candidate in candidates:
+        entity_types.add(candidate["type"])
+        if candidate["confidence"] >= 0.8:
+            high_confidence += 1
+    
+    return {
+        "success": True,
+        "candidates": candidates,
+        "summary": {
+            "total_entities": len(candidates),
+            "entity_types": list(entity_types),
+            "high_confidence_entities": high_confidence
+        },
+        "processing_time": 0.05,
+        "metadata": {
+            "detector": "simple_regex",
+            "text_length": len(text)
+        }
+    }
 
 @app.get("/")
 def root():
@@ -99,74 +376,92 @@ def health():
     }
 
 @app.post("/detect/text")
-async def detect_pii_text(request: DetectionRequest):
+async def detect_pii_text(request: DetectionRequest = Depends(msgspec_body(DetectionRequest))):
     """Detect PII in text using simple pattern matching"""
     try:
         logger.info(f"Processing text detection for user: {request.user_id}")
         
-        candidates = detector.detect(request.text)
-        
-        return {
-            "success": True,
-            "candidates": candidates,
-            "summary": {
-                "total_entities": len(candidates),
-                "entity_types": list(set(c["type"] for c in candidates)),
-                "high_confidence_entities": len([c for c in candidates if c["confidence"] >= 0.8])
-            },
-            "processing_time": 0.05,
-            "metadata": {
-                "detector": "simple_regex",
-                "text_length": len(request.text)
-            }
-        }
+        if len(request.text) >= _THREAD_SCAN_MIN_CHARS:
+            candidates = await asyncio.get_running_loop().run_in_executor(
+                _scan_executor, detector.detect, request.text
+            )
+        else:
+            candidates = detector.detect(request.text)
+        
+        return _detection_result(request.text, candidates)
         
     except Exception as e:
         logger.error(f"Error in text detection: {e}")
         raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
 
-@app.post("/detect/file")
-async def detect_pii_file(request: FileDetectionRequest):
-    """Placeholder for file detection - returns mock data for testing"""
+@app.post("/detect/batch")
+async def detect_pii_batch(request: BatchDetectionRequest = Depends(msgspec_body(BatchDetectionRequest))):
+    """Detect PII in several texts, prefiltered together in one scan"""
     try:
-        logger.info(f"Processing file detection for file: {request.file_id}")
+        logger.info(f"Processing batch detection of {len(request.texts)} texts for user: {request.user_id}")
         
-        # Mock detection results for testing
-        mock_candidates = [
-            {
-                "id": "mock_1",
-                "type": "email",
-                "text": "example@email.com",
-                "start": 0,
-                "end": 17,
-                "confidence": 0.95,
-                "metadata": {"source": "mock_file"}
-            },
-            {
-                "id": "mock_2", 
-                "type": "phone",
-                "text": "(555) 123-4567",
-                "start": 20,
-                "end": 34,
-                "confidence": 0.90,
-                "metadata": {"source": "mock_file"}
-            }
+        if sum(map(len, request.texts)) >= _THREAD_SCAN_MIN_CHARS:
+            batch = await asyncio.get_running_loop().run_in_executor(
+                _scan_executor, detector.detect_batch, request.texts
+            )
+        else:
+            batch = detector.detect_batch(request.texts)
+        
+        return [
+            _detection_result(text, candidates)
+            for text, candidates in zip(request.texts, batch)
         ]
         
-        return {
-            "success": True,
-            "candidates": mock_candidates,
-            "summary": {
-                "total_entities": len(mock_candidates),
-                "entity_types": ["email", "phone"],
-                "high_confidence_entities": 2
-            },
-            "processing_time": 0.1,
-            "metadata": {
-                "file_id": request.file_id,
-                "detector": "mock_for_testing"
-            }
+    except Exception as e:
+        logger.error(f"Error in batch detection: {e}")
+        raise HTTPException(status_code=500, detail=f"Batch detection failed: {str(e)}")
+
+# Mock /detect/file response, serialized once; the file ID placeholder
+# splits it into the bytes before and after the ID
+_MOCK_FILE_ID = "__FILE_ID__"
+_MOCK_FILE_PREFIX, _MOCK_FILE_SUFFIX = orjson.dumps({
+    "success": True,
+    "candidates": [
+        {
+            "id": "mock_1",
+            "type": "email",
+            "text": "example@email.com",
+            "start": 0,
+            "end": 17,
+            "confidence": 0.95,
+            "metadata": {"source": "mock_file"}
+        },
+        {
+            "id": "mock_2",
+            "type": "phone",
+            "text": "(555) 123-4567",
+            "start": 20,
+            "end": 34,
+            "confidence": 0.90,
+            "metadata": {"source": "mock_file"}
         }
+    ],
+    "summary": {
+        "total_entities": 2,
+        "entity_types": ["email", "phone"],
+        "high_confidence_entities": 2
+    },
+    "processing_time": 0.1,
+    "metadata": {
+        "file_id": _MOCK_FILE_ID,
+        "detector": "mock_for_testing"
+    }
+}).split(orjson.dumps(_MOCK_FILE_ID))
+
+@app.post("/detect/file")
+async def detect_pii_file(request: FileDetectionRequest = Depends(msgspec_body(FileDetectionRequest))):
+    """Placeholder for file detection - returns mock data for testing"""
+    try:
+        logger.info(f"Processing file detection for file: {request.file_id}")
+        
+        # The body is fixed apart from the file ID, so only that is encoded per request
+        content = _MOCK_FILE_PREFIX + orjson.dumps(request.file_id) + _MOCK_FILE_SUFFIX
+        return Response(content=content, media_type="application/json")
         
     except Exception as e:
         logger.error(f"Error in file detection: {e}")